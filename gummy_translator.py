@@ -5,6 +5,12 @@ import time
 import subprocess
 import json
 import tempfile
+import math
+import array
+import collections
+import asyncio
+import concurrent.futures
+import hashlib
 
 import dashscope
 import pyaudio
@@ -16,6 +22,11 @@ from dashscope.audio.tts_v2 import *
 import requests
 import ctypes  # 导入 ctypes 库
 
+try:
+    import numpy as np  # 可选依赖，用于向量化音频计算
+except ImportError:
+    np = None
+
 # Win11 UI 主题配置
 class Win11Theme:
     """Win11风格主题配置"""
@@ -111,27 +122,353 @@ class Win11Button(wx.Button):
         if size.height < 32:
             self.SetMinSize((size.width, 32))
 
+class PCMRingBuffer:
+    """预分配的PCM环形缓冲区
+
+    容量按秒固定，写满后按溢出策略处理（丢弃最旧、丢弃最新、阻塞写入）。
+    读取方可以按任意帧长读取，数据通过memoryview拷入复用的缓冲区，不产生新对象。
+    仅支持单个消费者：read()返回的memoryview在下一次同长度read()之前有效。
+    """
+
+    OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'block')
+
+    def __init__(self, capacity_seconds=10.0, sample_rate=16000, sample_width=2, overflow_policy='drop_oldest'):
+        if overflow_policy not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"未知的溢出策略: {overflow_policy}")
+
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.overflow_policy = overflow_policy
+        self.capacity = max(1, int(capacity_seconds * sample_rate)) * sample_width
+
+        self._buffer = bytearray(self.capacity)
+        self._view = memoryview(self._buffer)
+        self._read_pos = 0
+        self._size = 0
+        self._closed = False
+        self._woken = False
+        self._out_buffers = {}  # 按帧长复用的输出缓冲区
+
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+        # 统计计数器（单位：字节，对外按采样点换算）
+        self._high_water = 0
+        self._dropped = 0
+
+    @property
+    def depth_bytes(self):
+        """当前缓冲的字节数"""
+        return self._size
+
+    @property
+    def depth_seconds(self):
+        """当前缓冲的音频时长（秒）"""
+        return self._size / (self.sample_rate * self.sample_width)
+
+    def stats(self):
+        """返回缓冲区统计信息"""
+        with self._lock:
+            return {
+                'depth_samples': self._size // self.sample_width,
+                'depth_seconds': self._size / (self.sample_rate * self.sample_width),
+                'high_water_samples': self._high_water // self.sample_width,
+                'dropped_samples': self._dropped // self.sample_width,
+                'capacity_seconds': self.capacity / (self.sample_rate * self.sample_width),
+            }
+
+    def write(self, data, timeout=None):
+        """写入PCM数据，返回实际写入的字节数"""
+        src = memoryview(data).cast('B')
+        n = len(src)
+        if n == 0:
+            return 0
+
+        with self._lock:
+            if self._closed:
+                return 0
+
+            if self.overflow_policy == 'block':
+                return self._write_blocking(src, timeout)
+
+            if n > self.capacity:
+                # 单次写入就超过容量，只保留能放下的部分
+                if self.overflow_policy == 'drop_oldest':
+                    self._dropped += self._size + (n - self.capacity)
+                    self._read_pos = 0
+                    self._size = 0
+                    src = src[n - self.capacity:]
+                else:
+                    self._dropped += n - (self.capacity - self._size)
+                    src = src[:self.capacity - self._size]
+                n = len(src)
+
+            free = self.capacity - self._size
+            if n > free:
+                if self.overflow_policy == 'drop_oldest':
+                    discard = n - free
+                    self._read_pos = (self._read_pos + discard) % self.capacity
+                    self._size -= discard
+                    self._dropped += discard
+                else:
+                    self._dropped += n - free
+                    src = src[:free]
+                    n = free
+
+            self._copy_in(src)
+            return n
+
+    def _write_blocking(self, src, timeout):
+        """阻塞策略写入，调用方需持有锁"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        written = 0
+        while written < len(src):
+            free = self.capacity - self._size
+            if free == 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if self._closed or (remaining is not None and remaining <= 0):
+                    self._dropped += len(src) - written
+                    break
+                self._not_full.wait(remaining)
+                continue
+            chunk = src[written:written + free]
+            self._copy_in(chunk)
+            written += len(chunk)
+        return written
+
+    def _copy_in(self, src):
+        """把数据拷入环形存储，调用方需持有锁"""
+        n = len(src)
+        write_pos = (self._read_pos + self._size) % self.capacity
+        first = min(n, self.capacity - write_pos)
+        self._view[write_pos:write_pos + first] = src[:first]
+        if n > first:
+            self._view[:n - first] = src[first:]
+        self._size += n
+        if self._size > self._high_water:
+            self._high_water = self._size
+        self._not_empty.notify()
+
+    def _copy_out(self, dst, n):
+        """从环形存储拷出数据，调用方需持有锁"""
+        first = min(n, self.capacity - self._read_pos)
+        dst[:first] = self._view[self._read_pos:self._read_pos + first]
+        if n > first:
+            dst[first:n] = self._view[:n - first]
+        self._read_pos = (self._read_pos + n) % self.capacity
+        self._size -= n
+        self._not_full.notify()
+
+    def readinto(self, out, timeout=None):
+        """等待凑满len(out)字节后拷入out，返回读取的字节数（超时返回0）"""
+        dst = memoryview(out).cast('B')
+        n = len(dst)
+        with self._lock:
+            if not self._not_empty.wait_for(lambda: self._size >= n or self._closed or self._woken, timeout):
+                return 0
+            woken, self._woken = self._woken, False
+            if woken and self._size < n and not self._closed:
+                return 0
+            n = min(n, self._size)
+            if n:
+                self._copy_out(dst, n)
+            return n
+
+    def read(self, nbytes, timeout=None):
+        """读取nbytes字节，返回复用缓冲区上的memoryview，超时或关闭时返回None"""
+        out = self._out_buffers.get(nbytes)
+        if out is None:
+            out = memoryview(bytearray(nbytes))
+            self._out_buffers[nbytes] = out
+        n = self.readinto(out, timeout)
+        if n == 0:
+            return None
+        return out[:n]
+
+    def readinto_available(self, out):
+        """不等待，把已有的数据（最多len(out)字节，按采样点对齐）拷入out，返回读取的字节数"""
+        dst = memoryview(out).cast('B')
+        with self._lock:
+            n = min(len(dst), self._size)
+            n -= n % self.sample_width
+            if n:
+                self._copy_out(dst, n)
+            return n
+
+    def trim(self, keep_bytes):
+        """丢弃最旧的数据，只保留最新的keep_bytes字节，返回丢弃的字节数"""
+        with self._lock:
+            keep_bytes -= keep_bytes % self.sample_width
+            discard = self._size - keep_bytes
+            if discard <= 0:
+                return 0
+            self._read_pos = (self._read_pos + discard) % self.capacity
+            self._size -= discard
+            self._dropped += discard
+            self._not_full.notify_all()
+            return discard
+
+    def clear(self):
+        """清空缓冲区（不计入丢弃统计）"""
+        with self._lock:
+            self._read_pos = 0
+            self._size = 0
+            self._not_full.notify_all()
+
+    def wake(self):
+        """唤醒正在等待数据的读取方，本次读取按超时返回"""
+        with self._lock:
+            self._woken = True
+            self._not_empty.notify_all()
+
+    def close(self):
+        """关闭缓冲区，唤醒所有等待中的读写方"""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+class SessionManager:
+    """translator会话状态机
+
+    状态：idle（没有会话：启动前或静音挂起）、connecting（正在建立会话）、
+    streaming（发送音频）、paused（用户暂停）、draining（主动关闭会话，等待最终结果）、
+    restarting（会话意外中断或请求重启）。状态变化通过Condition立即通知等待方，
+    每次迁移都记录时间戳和原因，便于诊断。
+    """
+
+    IDLE = 'idle'
+    CONNECTING = 'connecting'
+    STREAMING = 'streaming'
+    PAUSED = 'paused'
+    DRAINING = 'draining'
+    RESTARTING = 'restarting'
+
+    def __init__(self, auto_restart=True, history=100):
+        self.auto_restart = auto_restart  # 会话意外关闭后自动重连，否则暂停等待手动恢复
+        self.state = self.IDLE
+        self.session_alive = False  # 当前会话是否仍然打开
+        self.outage = False  # 会话是否意外中断（重连后需要补发音频）
+        self.transitions = collections.deque(maxlen=history)  # (时间戳, 原状态, 新状态, 原因)
+        self._resume_state = self.STREAMING
+        self._entered = time.monotonic()
+        self._wake_hooks = []
+        self._changed = threading.Condition()
+
+    def add_wake_hook(self, hook):
+        """注册状态变化时调用的函数（用于唤醒阻塞在音频读取上的线程）"""
+        self._wake_hooks.append(hook)
+
+    def _transition(self, new_state, reason):
+        """切换状态，调用方需持有锁"""
+        if new_state == self.state:
+            return
+        now = time.monotonic()
+        self.transitions.append((time.time(), self.state, new_state, reason))
+        console_print(f"会话状态: {self.state} -> {new_state}（{reason}，停留 {now - self._entered:.2f}s）")
+        self.state = new_state
+        self._entered = now
+        self._changed.notify_all()
+        for hook in self._wake_hooks:
+            try:
+                hook()
+            except Exception as e:
+                console_print(f"会话状态唤醒回调出错: {e}")
+
+    def transition(self, new_state, reason):
+        """切换到新状态并通知等待方"""
+        with self._changed:
+            self._transition(new_state, reason)
+
+    @property
+    def paused(self):
+        return self.state == self.PAUSED
+
+    def pause(self):
+        """用户暂停监听"""
+        with self._changed:
+            if self.state != self.PAUSED:
+                self._resume_state = self.state
+                self._transition(self.PAUSED, '用户暂停')
+
+    def resume(self):
+        """用户恢复监听，暂停期间会话已关闭时重建会话"""
+        with self._changed:
+            if self.state != self.PAUSED:
+                return
+            target = self._resume_state
+            if target in (self.STREAMING, self.CONNECTING) and not self.session_alive:
+                target = self.RESTARTING
+            self._transition(target, '用户恢复')
+
+    def toggle_pause(self):
+        """切换暂停/恢复，返回切换后是否处于暂停状态"""
+        with self._changed:
+            if self.state == self.PAUSED:
+                self.resume()
+            else:
+                self.pause()
+            return self.state == self.PAUSED
+
+    def request_restart(self, reason):
+        """请求重建会话；暂停期间在恢复时重建，挂起期间没有会话，下次建立时自然使用新设置"""
+        with self._changed:
+            if self.state == self.PAUSED:
+                if self.session_alive:
+                    self._resume_state = self.RESTARTING
+            elif self.state != self.IDLE:
+                self._transition(self.RESTARTING, reason)
+
+    def session_started(self):
+        """新会话已建立"""
+        with self._changed:
+            self.session_alive = True
+            self.outage = False
+            self._transition(self.STREAMING, '会话已建立')
+
+    def session_lost(self, reason):
+        """当前会话已关闭；发送过程中意外关闭时进入重连（或暂停等待手动恢复）"""
+        with self._changed:
+            self.session_alive = False
+            if self.state != self.STREAMING:
+                return  # 主动关闭（挂起、重启、退出）或暂停期间关闭，由对应流程处理
+            self.outage = True
+            if self.auto_restart:
+                self._transition(self.RESTARTING, reason)
+            else:
+                self._resume_state = self.RESTARTING
+                self._transition(self.PAUSED, f"{reason}，等待手动恢复")
+
+    def wait_while(self, state, timeout=None):
+        """等待离开指定状态（或超时），返回当前状态"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.state != state, timeout)
+            return self.state
+
 # Add a global variable to control TTS
 enable_tts = False
 
 # Add a global variable to control API calls
 enable_api_calls = True  # 默认启用API调用
 
-# Add a global variable to control listening/pause
-listening_paused = False  # 默认不暂停监听
-
-# Add a global variable to track translator status
-translator_stopped = False  # 跟踪translator状态
-need_restart_translator = False  # 标记是否需要重启translator
+# translator会话状态（暂停/恢复、重连、静音挂起）
+session_manager = SessionManager()
 
 # Add global variables for audio source control
 audio_source = 'system'  # 'microphone' or 'system' - 默认使用系统音频
 current_system_device = None  # 当前选择的系统音频设备(索引)
 current_system_device_name = None  # 当前选择的系统音频设备名称
 ffmpeg_process = None  # FFmpeg进程
-system_audio_queue = queue.Queue()  # 系统音频数据队列
+system_audio_buffer = PCMRingBuffer()  # 系统音频环形缓冲区（load_config后按配置重建）
+# 暂停、恢复、重启时立即唤醒阻塞在环形缓冲区上的读取（按名字取当前的缓冲区，重建后仍然有效）
+session_manager.add_wake_hook(lambda: system_audio_buffer.wake())
 ffmpeg_path = None  # 自定义FFmpeg路径
 
+# 音频格式：16kHz、16bit、单声道，每帧100ms
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_FRAME_BYTES = 3200
+
 # 控制台输出控制
 enable_console_output = True  # 默认启用控制台输出
 
@@ -150,12 +487,91 @@ DEFAULT_CONFIG = {
     'dashscope_api_key': '<your-dashscope-api-key>',
     'siliconflow_api_key': '<your-SiliconFlow-api-key>',
     'target_language': 'zh',
+    'extra_target_languages': [],  # 同一会话附加的翻译目标语言，每种语言单独显示一个字幕面板
+    'tts_language': None,  # TTS朗读的目标语言（None表示主目标语言）
+    'tts_voices': {},  # 按目标语言指定TTS音色，未指定的语言使用tts_voice
     'tts_voice': 'FunAudioLLM/CosyVoice2-0.5B:alex',
     'current_system_device': None,
     'current_system_device_name': None,
     'enable_tts': False,
     'asr_model': 'gummy-realtime-v1',  # 默认ASR模型
     'enable_console_output': True,  # 默认启用控制台输出
+    'capture_probe_timeout': 5,  # 并发探测捕获方法的超时时间（秒）
+    'last_good_capture': None,  # 上次成功的FFmpeg捕获方法，下次启动优先尝试
+    'device_cache_ttl': 300,  # 设备和FFmpeg探测结果的缓存时间（秒）
+    'auto_select_device': False,  # 启动时按实际信号能量自动选择系统音频设备
+    'auto_select_duration': 2.0,  # 自动选择时每个设备的检测时长（秒）
+    'auto_select_min_rms': 100,  # 判定设备有信号的最小RMS
+    'vad': {
+        'enabled': False,  # 发送前进行语音活动检测，静音帧不发送（需要手动开启）
+        'open_dbfs': -45,  # 开门门限（dBFS）
+        'close_dbfs': -52,  # 关门门限（dBFS），低于开门门限形成迟滞
+        'pre_roll_ms': 300,  # 开门时补发的静音前缓存
+        'hangover_ms': 600,  # 语音结束后继续发送的时长
+        'spectral_check': False,  # 开门时额外检查语音频段能量占比（需要numpy）
+        'speech_band_ratio': 0.5,  # 语音频段能量占比门限
+        'keepalive_interval': 1.0  # 静音期间每隔多少秒发送一帧保持连接（0表示不发送）
+    },
+    'idle_suspend_seconds': 120,  # 连续静音超过该秒数后挂起translator会话（0表示不挂起，需要启用VAD）
+    'reconnect': {
+        'auto': True,  # translator意外停止后自动重连
+        'history_seconds': 3,  # 保留最近已发送音频的时长，重连后补发
+        'max_outage_seconds': 30,  # 断线期间最多缓存的音频时长
+        'catch_up_rate': 2.0,  # 补发速率（实时速率的倍数，需大于1，0表示一次补发全部积压）
+        'max_retry_delay': 30  # 重连失败后的最大重试间隔（秒）
+    },
+    'session_rotation': {
+        'standby': False,  # 始终保持一个预热的备用会话，重连时直接切换
+        'standby_keepalive_interval': 1.0,  # 备用会话发送静音帧的间隔（秒，0表示不发送）
+        'max_session_seconds': 3000,  # 单个会话的最长时长，到达前在句子边界主动轮换（0表示不轮换）
+        'warmup_lead_seconds': 60,  # 轮换前提前多少秒预热备用会话
+        'boundary_window_seconds': 30  # 轮换前多少秒开始等待句子边界，超时后强制轮换
+    },
+    'audio_buffer': {
+        'capacity_seconds': 10,  # 系统音频缓冲区容量（秒）
+        'overflow_policy': 'drop_oldest'  # 溢出策略: drop_oldest / drop_newest / block
+    },
+    'subtitle_renderer': 'richtext',  # 字幕渲染方式: richtext（RichTextCtrl）/ canvas（双缓冲画布，只绘制可见的末尾几行）
+    'history': {
+        'max_sentences': 100,  # 每个字幕面板在内存中保留的最多句数
+        'max_chars': 1000,  # 每个字幕面板在内存中保留的最多字符数
+        'transcript_dir': 'transcripts',  # 超出部分追加写入的转录文件目录
+        'load_back_sentences': 20  # 向上滚动到顶部时每次从转录文件读回的句数
+    },
+    'ui_timer': {
+        'fast_interval': 100,  # 有字幕更新时的刷新间隔（毫秒）
+        'idle_interval': 500,  # 连续idle_after_ticks次没有更新后的刷新间隔
+        'paused_interval': 1000,  # 暂停或静音挂起时的刷新间隔
+        'idle_after_ticks': 20,  # 连续多少次没有更新后降到idle_interval
+        'hover_fallback_interval': 500  # 鼠标悬停检查的兜底间隔（主要靠进入/离开事件）
+    },
+    'tts_client': {
+        'connect_timeout': 5,  # 连接超时（秒）
+        'read_timeout': 30,  # 读取超时（秒），流式响应中两块数据之间的最长间隔
+        'pool_size': 4,  # 连接池大小
+        'warm_up': True  # 启动或启用TTS时预先建立连接
+    },
+    'tts_cache': {
+        'enabled': True,  # 缓存合成结果，重复的句子直接播放
+        'memory_mb': 32,  # 内存LRU缓存的容量
+        'disk_dir': 'tts_cache',  # 磁盘缓存目录（None表示只用内存缓存）
+        'disk_mb': 256  # 磁盘缓存的容量，超出时删除最久未使用的文件
+    },
+    'tts_pipeline': {
+        'workers': 2,  # 同时合成的句子数
+        'prefetch_sentences': 2  # 当前句播放时最多提前合成的句数
+    },
+    'tts_player': {
+        'output_device': None,  # TTS输出设备的PyAudio索引（None表示系统默认输出）
+        'frames_per_buffer': 1024,  # 输出流每次回调的帧数，越小延迟越低但越容易断音
+        'buffer_seconds': 10.0,  # 抖动缓冲区容量（秒），写满时合成线程等待
+        'prebuffer_ms': 200  # 每句（以及断音后）攒够多少毫秒再开始播放
+    },
+    'runtime': {
+        'mode': 'threads',  # 运行时: threads（后台线程）/ asyncio（协程流水线）
+        'audio_queue_frames': 50,  # asyncio模式下采集到发送之间的队列长度（帧），满时反压采集
+        'tts_queue_words': 200  # asyncio模式下待合成词的队列长度，满时丢弃最旧的词
+    },
     'api': {
         'enabled': True  # 默认启用API调用
     }
@@ -164,9 +580,20 @@ DEFAULT_CONFIG = {
 # 全局配置
 config = DEFAULT_CONFIG.copy()
 
+def create_system_audio_buffer():
+    """按配置创建系统音频环形缓冲区"""
+    buffer_config = config.get('audio_buffer', {})
+    capacity_seconds = buffer_config.get('capacity_seconds', 10)
+    overflow_policy = buffer_config.get('overflow_policy', 'drop_oldest')
+    try:
+        return PCMRingBuffer(capacity_seconds, AUDIO_SAMPLE_RATE, 2, overflow_policy)
+    except ValueError as e:
+        console_print(f"音频缓冲区配置无效: {e}，使用默认配置")
+        return PCMRingBuffer(capacity_seconds, AUDIO_SAMPLE_RATE, 2, 'drop_oldest')
+
 def load_config():
     """加载配置文件"""
-    global config, audio_source, ffmpeg_path, target_language, current_system_device, current_system_device_name, enable_tts, enable_api_calls, enable_console_output
+    global config, audio_source, ffmpeg_path, target_language, current_system_device, current_system_device_name, enable_tts, enable_api_calls, enable_console_output, system_audio_buffer
     
     try:
         if os.path.exists(CONFIG_FILE):
@@ -189,6 +616,8 @@ def load_config():
     enable_tts = config.get('enable_tts', False)
     enable_api_calls = config.get('api', {}).get('enabled', True)
     enable_console_output = config.get('enable_console_output', True)
+    system_audio_buffer = create_system_audio_buffer()
+    device_registry.ttl = config.get('device_cache_ttl', 300)
 
 def save_config():
     """保存配置文件"""
@@ -260,27 +689,216 @@ def check_api_status():
     console_print(f"DashScope API Key: {api_key_status}")
     
     # 检查目标语言
-    console_print(f"翻译目标语言: {target_language}")
+    console_print(f"翻译目标语言: {', '.join(get_target_languages())}")
     
     console_print("=" * 50)
 
 # Set the target language for translation
 target_language = 'zh'
 
-# Function to check if FFmpeg is available
-def check_ffmpeg():
-    """检查FFmpeg是否可用"""
-    global ffmpeg_path, config
+# 支持的翻译目标语言代码
+SUPPORTED_TARGET_LANGUAGES = ("zh", "en", "ja", "ko", "fr", "es", "de", "ru")
+
+def get_target_languages():
+    """当前会话的所有翻译目标语言（主目标语言在前，忽略不支持的代码）"""
+    languages = [target_language]
+    for language in config.get('extra_target_languages', []):
+        if language in SUPPORTED_TARGET_LANGUAGES and language not in languages:
+            languages.append(language)
+    return languages
+
+def get_tts_language():
+    """TTS朗读的目标语言"""
+    return config.get('tts_language') or target_language
+
+def get_tts_voice(language):
+    """按目标语言选择TTS音色"""
+    return config.get('tts_voices', {}).get(language) or config.get('tts_voice', 'FunAudioLLM/CosyVoice2-0.5B:alex')
+
+class ResultSubscriptions:
+    """按目标语言登记翻译结果的消费者（字幕面板、TTS）
+
+    回调只对至少有一个订阅者的语言做差分和分发，没有人订阅的语言直接跳过。
+    """
+
+    def __init__(self):
+        self._languages = {}  # 消费者 -> 订阅的语言集合
+        self._subscribed = frozenset()
+        self._lock = threading.Lock()
+
+    def subscribe(self, consumer, languages):
+        """设置消费者订阅的语言（替换之前的订阅）"""
+        with self._lock:
+            self._languages[consumer] = set(languages)
+            self._subscribed = frozenset().union(*self._languages.values())
+
+    def unsubscribe(self, consumer):
+        with self._lock:
+            self._languages.pop(consumer, None)
+            self._subscribed = frozenset().union(*self._languages.values())
+
+    def wants(self, consumer, language):
+        """消费者是否订阅了该语言"""
+        return language in self._languages.get(consumer, ())
+
+    @property
+    def languages(self):
+        """至少有一个订阅者的语言"""
+        return self._subscribed
+
+# 翻译结果按语言的订阅关系
+result_subscriptions = ResultSubscriptions()
+
+# 后台探测线程池：FFmpeg探测、设备枚举和信号检测都在这里执行，避免阻塞UI线程
+probe_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix='probe')
+
+def run_probe_in_background(func, on_done, *args):
+    """在探测线程池中执行func(*args)，完成后在UI线程调用on_done(结果, 异常)"""
+    def deliver(future):
+        error = future.exception()
+        result = None if error is not None else future.result()
+        if error is not None:
+            console_print(f"后台探测出错: {error}")
+        wx.CallAfter(on_done, result, error)
     
+    future = probe_executor.submit(func, *args)
+    future.add_done_callback(deliver)
+    return future
+
+class DeviceRegistry:
+    """音频设备和外部工具探测结果的缓存注册表
+
+    每类探测（FFmpeg路径、DirectShow设备、PyAudio设备）只执行一次并按TTL缓存，
+    可以提前在后台线程探测。调用方通过refresh()/invalidate()显式刷新，
+    UI线程用get(block=False)读取时不会启动子进程。
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl  # 缓存有效期（秒），None表示永不过期
+        self._probes = {}
+        self._probe_locks = {}
+        self._cache = {}  # key -> (探测时间, 结果)
+        self._pending = set()  # 正在后台探测的key
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def register(self, key, probe):
+        """注册一类探测"""
+        with self._lock:
+            self._probes[key] = probe
+            self._probe_locks[key] = threading.Lock()
+
+    def add_listener(self, listener):
+        """注册探测完成回调，回调参数为key，在探测线程中调用"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """移除探测完成回调（对话框关闭时）"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _keys(self, keys):
+        if keys is None:
+            return list(self._probes)
+        if isinstance(keys, str):
+            return [keys]
+        return list(keys)
+
+    def _is_fresh(self, key):
+        """调用方需持有锁"""
+        entry = self._cache.get(key)
+        return entry is not None and (self.ttl is None or time.monotonic() - entry[0] < self.ttl)
+
+    def get(self, key, block=True, default=None):
+        """获取探测结果
+        
+        缓存有效时直接返回；否则block=True时同步探测，
+        block=False时启动后台探测并返回过期的旧结果或default。
+        """
+        with self._lock:
+            if self._is_fresh(key):
+                return self._cache[key][1]
+        if block:
+            return self._probe(key, default)
+        self.prefetch(key)
+        with self._lock:
+            entry = self._cache.get(key)
+        return entry[1] if entry is not None else default
+
+    def prefetch(self, keys=None):
+        """在后台线程中探测缓存已失效的项"""
+        for key in self._keys(keys):
+            with self._lock:
+                if self._is_fresh(key) or key in self._pending:
+                    continue
+                self._pending.add(key)
+            probe_executor.submit(self._background_probe, key)
+
+    def refresh(self, keys=None, background=False):
+        """丢弃缓存并重新探测"""
+        keys = self._keys(keys)
+        self.invalidate(keys)
+        if background:
+            self.prefetch(keys)
+        else:
+            for key in keys:
+                self._probe(key)
+
+    def invalidate(self, keys=None):
+        """丢弃缓存，下次访问时重新探测"""
+        with self._lock:
+            for key in self._keys(keys):
+                self._cache.pop(key, None)
+
+    def is_pending(self, key):
+        """该项是否正在后台探测"""
+        with self._lock:
+            return key in self._pending
+
+    def _background_probe(self, key):
+        try:
+            self._probe(key)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _probe(self, key, default=None):
+        # 同一key同一时间只探测一次，其他调用方等待结果
+        with self._probe_locks[key]:
+            with self._lock:
+                if self._is_fresh(key):
+                    return self._cache[key][1]
+            try:
+                value = self._probes[key]()
+            except Exception as e:
+                console_print(f"探测 {key} 失败: {e}")
+                return default
+            with self._lock:
+                self._cache[key] = (time.monotonic(), value)
+        
+        for listener in list(self._listeners):
+            try:
+                listener(key)
+            except Exception as e:
+                console_print(f"设备注册表回调出错: {e}")
+        return value
+
+# 全局设备注册表，探测函数在调用时解析，定义顺序不影响
+device_registry = DeviceRegistry()
+device_registry.register('ffmpeg', lambda: probe_ffmpeg_path())
+device_registry.register('dshow_devices', lambda: probe_windows_audio_devices())
+device_registry.register('pyaudio_devices', lambda: probe_pyaudio_devices())
+
+def probe_ffmpeg_path(use_configured=True):
+    """探测可用的FFmpeg路径，找不到时返回None（use_configured=False时忽略配置中的路径）"""
     # 如果配置中有自定义路径，优先使用
-    if config.get('ffmpeg_path') and os.path.exists(config['ffmpeg_path']):
+    if use_configured and config.get('ffmpeg_path') and os.path.exists(config['ffmpeg_path']):
         try:
             result = subprocess.run([config['ffmpeg_path'], '-version'], 
                                   capture_output=True, text=True, timeout=5)
             if result.returncode == 0:
-                ffmpeg_path = config['ffmpeg_path']
-                console_print(f"使用配置中的FFmpeg: {ffmpeg_path}")
-                return True
+                console_print(f"使用配置中的FFmpeg: {config['ffmpeg_path']}")
+                return config['ffmpeg_path']
         except (subprocess.TimeoutExpired, FileNotFoundError):
             console_print(f"配置中的FFmpeg路径无效: {config['ffmpeg_path']}")
     
@@ -289,8 +907,7 @@ def check_ffmpeg():
         result = subprocess.run(['ffmpeg', '-version'], 
                               capture_output=True, text=True, timeout=5)
         if result.returncode == 0:
-            ffmpeg_path = 'ffmpeg'  # 使用系统PATH中的ffmpeg
-            return True
+            return 'ffmpeg'  # 使用系统PATH中的ffmpeg
     except (subprocess.TimeoutExpired, FileNotFoundError):
         pass
     
@@ -308,12 +925,50 @@ def check_ffmpeg():
                 result = subprocess.run([path, '-version'], 
                                       capture_output=True, text=True, timeout=5)
                 if result.returncode == 0:
-                    ffmpeg_path = path
                     console_print(f"找到FFmpeg: {path}")
-                    return True
+                    return path
             except (subprocess.TimeoutExpired, FileNotFoundError):
                 continue
     
+    return None
+
+# 可执行文件测试结果缓存：(路径, 修改时间) -> 是否能运行
+_ffmpeg_test_cache = {}
+
+def test_ffmpeg_executable(path):
+    """测试指定的FFmpeg能否运行，返回状态文本（同一文件的结果会被缓存）"""
+    if not os.path.exists(path):
+        return "❌ FFmpeg路径不存在"
+    key = (path, os.path.getmtime(path))
+    status = _ffmpeg_test_cache.get(key)
+    if status is not None:
+        return status
+    try:
+        result = subprocess.run([path, '-version'], 
+                              capture_output=True, text=True, timeout=5)
+        if result.returncode == 0:
+            status = "✅ FFmpeg测试成功"
+        else:
+            status = "❌ FFmpeg无法运行"
+    except Exception as e:
+        return f"❌ FFmpeg测试失败: {e}"  # 超时等异常不缓存，下次重试
+    _ffmpeg_test_cache[key] = status
+    return status
+
+# Function to check if FFmpeg is available
+def check_ffmpeg(block=True):
+    """检查FFmpeg是否可用（结果由device_registry缓存）
+    
+    block=False时不会在当前线程探测，结果未知时返回None。
+    """
+    global ffmpeg_path
+    
+    path = device_registry.get('ffmpeg', block=block, default=False)
+    if path is False:
+        return None
+    if path:
+        ffmpeg_path = path
+        return True
     return False
 
 def get_ffmpeg_command():
@@ -428,15 +1083,13 @@ def test_audio_capture():
     
     try:
         while time.time() - start_time < 10:
-            try:
-                # 检查是否有音频数据
-                data = system_audio_queue.get(timeout=0.1)
-                if data:
-                    data_count += 1
-                    if data_count % 10 == 0:  # 每秒显示一次
-                        console_print(f"⏱️  已捕获 {data_count} 个音频数据包...")
-            except queue.Empty:
+            # 检查是否有音频数据
+            data = system_audio_buffer.read(AUDIO_FRAME_BYTES, timeout=0.1)
+            if data is None:
                 continue
+            data_count += 1
+            if data_count % 10 == 0:  # 每秒显示一次
+                console_print(f"⏱️  已捕获 {data_count} 个音频数据包...")
                 
     except KeyboardInterrupt:
         console_print("用户中断测试")
@@ -481,29 +1134,23 @@ def list_all_audio_devices():
     
     # 2. 检查PyAudio设备
     console_print("\n🎤 PyAudio 设备:")
-    try:
-        import pyaudio
-        p = pyaudio.PyAudio()
-        
-        for i in range(p.get_device_count()):
-            device_info = p.get_device_info_by_index(i)
-            device_type = ""
-            if device_info['maxInputChannels'] > 0:
-                device_type += "输入 "
-            if device_info['maxOutputChannels'] > 0:
-                device_type += "输出 "
-            
-            # 特别标记VB-Cable设备
-            device_name = device_info['name']
-            vb_indicator = ""
-            if any(keyword in device_name.lower() for keyword in ['cable', 'vb-audio', 'vb-cable']):
-                vb_indicator = " [VB-Cable]"
-            
-            console_print(f"  {i}: {device_name} ({device_type}){vb_indicator}")
-        
-        p.terminate()
-    except Exception as e:
-        console_print(f"  获取PyAudio设备失败: {e}")
+    pyaudio_devices = device_registry.get('pyaudio_devices')
+    if pyaudio_devices is None:
+        console_print("  获取PyAudio设备失败")
+    for device_info in pyaudio_devices or []:
+        device_type = ""
+        if device_info['max_input_channels'] > 0:
+            device_type += "输入 "
+        if device_info['max_output_channels'] > 0:
+            device_type += "输出 "
+        
+        # 特别标记VB-Cable设备
+        device_name = device_info['name']
+        vb_indicator = ""
+        if any(keyword in device_name.lower() for keyword in ['cable', 'vb-audio', 'vb-cable']):
+            vb_indicator = " [VB-Cable]"
+        
+        console_print(f"  {device_info['index']}: {device_name} ({device_type}){vb_indicator}")
     
     # 3. 检查虚拟音频设备
     console_print("\n🔄 虚拟音频设备:")
@@ -606,7 +1253,11 @@ def show_audio_source_selection():
             console_print("请重新输入")
 
 # Function to get Windows audio devices using FFmpeg
-def get_windows_audio_devices():
+def get_windows_audio_devices(block=True):
+    """获取FFmpeg DirectShow音频设备列表（结果由device_registry缓存，block=False时不在当前线程探测）"""
+    return list(device_registry.get('dshow_devices', block=block, default=[]))
+
+def probe_windows_audio_devices():
     """使用FFmpeg获取Windows音频设备列表"""
     try:
         # 使用FFmpeg的dshow过滤器列出音频设备
@@ -683,41 +1334,57 @@ def get_windows_audio_devices():
         console_print(f"获取FFmpeg音频设备失败: {e}")
         return []
 
+def build_ffmpeg_capture_cmd(input_format, input_spec):
+    """构建FFmpeg捕获命令，输出16kHz单声道裸PCM（s16le），不带WAV文件头"""
+    return [
+        get_ffmpeg_command(),
+        '-f', input_format,
+        '-i', input_spec,
+        '-acodec', 'pcm_s16le',
+        '-ar', str(AUDIO_SAMPLE_RATE),
+        '-ac', '1',
+        '-loglevel', 'info',
+        '-nostats',  # 不输出进度统计，避免stderr管道被写满导致FFmpeg阻塞
+        '-f', 's16le',
+        'pipe:1'
+    ]
+
+def read_pcm_frame(stream, frame_view):
+    """用readinto把一帧PCM读入frame_view，处理短读，返回读到的字节数（0表示流结束）"""
+    filled = 0
+    total = len(frame_view)
+    while filled < total:
+        n = stream.readinto(frame_view[filled:])
+        if not n:
+            break
+        filled += n
+    # 流结束时丢弃不完整的采样点，保证16bit对齐
+    return filled - (filled % 2)
+
 # Function to start FFmpeg system audio capture
 def start_ffmpeg_audio_capture(device_name=None):
     """启动FFmpeg系统音频捕获"""
-    global ffmpeg_process, system_audio_queue
+    global ffmpeg_process
     
+    start_time = time.monotonic()
     try:
         # 停止之前的进程
         stop_ffmpeg_audio_capture()
         
-        # 清空队列中的旧数据
-        while not system_audio_queue.empty():
-            try:
-                system_audio_queue.get_nowait()
-            except queue.Empty:
-                break
+        # 清空缓冲区中的旧数据
+        system_audio_buffer.clear()
         
         # 尝试多种捕获方法，优先使用VB-Cable和立体声混音
         capture_methods = []
         
         # 优先级1: 用户指定的DirectShow设备（如果有的话）
+        chosen_method = None
         if device_name is not None:
-            capture_methods.append({
+            chosen_method = {
                 'name': f'DirectShow - {device_name}',
-                'cmd': [
-                    get_ffmpeg_command(),
-                    '-f', 'dshow',
-                    '-i', f'audio={device_name}',
-                    '-acodec', 'pcm_s16le',
-                    '-ar', '16000',
-                    '-ac', '1',
-                    '-loglevel', 'info',
-                    '-f', 'wav',
-                    'pipe:1'
-                ]
-            })
+                'cmd': build_ffmpeg_capture_cmd('dshow', f'audio={device_name}')
+            }
+            capture_methods.append(chosen_method)
         
         # 优先级2: VB-Cable虚拟音频设备（优先使用，适合虚拟机测试）
         vb_cable_names = [
@@ -730,17 +1397,7 @@ def start_ffmpeg_audio_capture(device_name=None):
         for vb_name in vb_cable_names:
             capture_methods.append({
                 'name': f'DirectShow - {vb_name}',
-                'cmd': [
-                    get_ffmpeg_command(),
-                    '-f', 'dshow',
-                    '-i', f'audio={vb_name}',
-                    '-acodec', 'pcm_s16le',
-                    '-ar', '16000',
-                    '-ac', '1',
-                    '-loglevel', 'info',
-                    '-f', 'wav',
-                    'pipe:1'
-                ]
+                'cmd': build_ffmpeg_capture_cmd('dshow', f'audio={vb_name}')
             })
         
         # 优先级3: 立体声混音设备（提前优先级）
@@ -756,83 +1413,65 @@ def start_ffmpeg_audio_capture(device_name=None):
         for mix_name in stereo_mix_names:
             capture_methods.append({
                 'name': f'DirectShow - {mix_name}',
-                'cmd': [
-                    get_ffmpeg_command(),
-                    '-f', 'dshow',
-                    '-i', f'audio={mix_name}',
-                    '-acodec', 'pcm_s16le',
-                    '-ar', '16000',
-                    '-ac', '1',
-                    '-loglevel', 'info',
-                    '-f', 'wav',
-                    'pipe:1'
-                ]
+                'cmd': build_ffmpeg_capture_cmd('dshow', f'audio={mix_name}')
             })
         
         # 优先级4: WASAPI方法（作为备用）
         capture_methods.append({
             'name': 'WASAPI默认输出设备',
-            'cmd': [
-                get_ffmpeg_command(),
-                '-f', 'wasapi',
-                '-i', 'audio=',  # 空字符串表示默认设备
-                '-acodec', 'pcm_s16le',
-                '-ar', '16000',
-                '-ac', '1',
-                '-loglevel', 'info',  # 临时提高日志级别用于调试
-                '-f', 'wav',
-                'pipe:1'
-            ]
+            'cmd': build_ffmpeg_capture_cmd('wasapi', 'audio=')  # 空字符串表示默认设备
         })
         
         # 优先级5: WASAPI with loopback flag
         capture_methods.append({
             'name': 'WASAPI Loopback',
-            'cmd': [
-                get_ffmpeg_command(),
-                '-f', 'wasapi',
-                '-i', 'audio=@device_cm_{33D9A762-90C8-11D0-BD43-00A0C911CE86}\\wave_{B3F8FA53-0004-438E-9003-51A46E139BEB}',
-                '-acodec', 'pcm_s16le',
-                '-ar', '16000',
-                '-ac', '1',
-                '-loglevel', 'info',
-                '-f', 'wav',
-                'pipe:1'
-            ]
+            'cmd': build_ffmpeg_capture_cmd(
+                'wasapi',
+                'audio=@device_cm_{33D9A762-90C8-11D0-BD43-00A0C911CE86}\\wave_{B3F8FA53-0004-438E-9003-51A46E139BEB}'
+            )
         })
         
-        # 依次尝试每种方法
-        for method in capture_methods:
-            console_print(f"尝试音频捕获方法: {method['name']}")
-            try:
-                ffmpeg_process = subprocess.Popen(
-                    method['cmd'],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    bufsize=0
-                )
-                
-                # 等待进程启动并检查是否成功
-                time.sleep(1.0)
-                
-                if ffmpeg_process.poll() is None:
-                    # 进程仍在运行，可能成功了
-                    console_print(f"✅ {method['name']} 启动成功")
-                    break
-                else:
-                    # 进程已退出，获取错误信息
-                    stderr_output = ffmpeg_process.stderr.read().decode('utf-8', errors='ignore')
-                    console_print(f"❌ {method['name']} 失败: {stderr_output[:200]}...")
-                    ffmpeg_process = None
-                    
-            except Exception as e:
-                console_print(f"❌ {method['name']} 异常: {e}")
-                ffmpeg_process = None
+        # 依次探测：用户指定的设备单独探测；没有指定或指定的设备失败时再试上次成功的方法；
+        # 都失败后并发探测其余方法。用户的明确选择不会被上次成功的方法抢先替换
+        last_good_method = None
+        last_good = config.get('last_good_capture')
+        if last_good and last_good.get('args'):
+            last_good_method = next((m for m in capture_methods if m['name'] == last_good.get('name')), None)
+            if last_good_method is None:
+                last_good_method = {
+                    'name': last_good.get('name', '上次成功的捕获方法'),
+                    'cmd': [get_ffmpeg_command()] + list(last_good['args'])
+                }
+                capture_methods.insert(0, last_good_method)
+        
+        probe_timeout = config.get('capture_probe_timeout', 5)
+        tiers = []
+        if chosen_method is not None:
+            tiers.append([chosen_method])
+        if last_good_method is not None and last_good_method is not chosen_method:
+            tiers.append([last_good_method])
+        tried = [method for tier in tiers for method in tier]
+        tiers.append([m for m in capture_methods if not any(m is t for t in tried)])
+        
+        winner = None
+        for tier in tiers:
+            if tier:
+                winner = probe_capture_methods(tier, probe_timeout)
+            if winner is not None:
+                break
         
-        if ffmpeg_process is None:
+        if winner is None:
             console_print("所有音频捕获方法都失败了")
             return False
         
+        method, ffmpeg_process, first_frame = winner
+        time_to_first_audio = time.monotonic() - start_time
+        console_print(f"⏱️  首个音频数据到达耗时: {time_to_first_audio:.2f}s（{method['name']}）")
+        
+        # 探测时读到的第一帧也是有效音频，先放入缓冲区
+        system_audio_buffer.write(first_frame)
+        remember_capture_method(method)
+        
         # 启动线程读取音频数据
         audio_thread = threading.Thread(target=read_ffmpeg_audio, daemon=True)
         audio_thread.start()
@@ -844,35 +1483,130 @@ def start_ffmpeg_audio_capture(device_name=None):
         console_print(f"启动FFmpeg音频捕获失败: {e}")
         return False
 
+def remember_capture_method(method):
+    """把成功的捕获命令（不含FFmpeg路径）保存到配置文件，下次启动优先尝试"""
+    last_good = {'name': method['name'], 'args': method['cmd'][1:]}
+    if config.get('last_good_capture') != last_good:
+        config['last_good_capture'] = last_good
+        save_config()
+
+def probe_capture_methods(capture_methods, timeout=5.0):
+    """并发探测多个FFmpeg捕获方法，返回最先产出一帧PCM数据的(method, process, first_frame)，全部失败返回None"""
+    results = queue.Queue()
+    lock = threading.Lock()
+    state = {'done': False, 'processes': []}
+    
+    def release(process):
+        try:
+            process.terminate()
+            process.wait(timeout=3)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        except Exception:
+            pass
+    
+    def probe(method):
+        try:
+            process = subprocess.Popen(
+                method['cmd'],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                bufsize=0
+            )
+        except Exception as e:
+            results.put((method, None, None, str(e)))
+            return
+        
+        with lock:
+            if state['done']:
+                # 已经有方法胜出或探测超时
+                release(process)
+                return
+            state['processes'].append(process)
+        
+        first_frame = bytearray(AUDIO_FRAME_BYTES)
+        try:
+            filled = read_pcm_frame(process.stdout, memoryview(first_frame))
+        except Exception:
+            filled = 0
+        
+        if filled == AUDIO_FRAME_BYTES:
+            results.put((method, process, first_frame, None))
+            return
+        
+        # 输出流提前结束，进程已退出，获取错误信息
+        error = ''
+        try:
+            process.wait(timeout=1)
+            error = process.stderr.read().decode('utf-8', errors='ignore').strip()
+        except Exception:
+            pass
+        results.put((method, None, None, error or 'FFmpeg未输出音频数据'))
+    
+    for method in capture_methods:
+        console_print(f"尝试音频捕获方法: {method['name']}")
+        threading.Thread(target=probe, args=(method,), daemon=True).start()
+    
+    winner = None
+    pending = len(capture_methods)
+    deadline = time.monotonic() + timeout
+    while pending and winner is None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            method, process, first_frame, error = results.get(timeout=remaining)
+        except queue.Empty:
+            break
+        pending -= 1
+        if process is not None:
+            winner = (method, process, first_frame)
+            console_print(f"✅ {method['name']} 启动成功")
+        else:
+            console_print(f"❌ {method['name']} 失败: {error[:200]}...")
+    
+    if winner is None and pending:
+        console_print(f"{pending} 个捕获方法在 {timeout} 秒内没有产生音频数据")
+    
+    # 终止其余仍在运行的探测进程
+    with lock:
+        state['done'] = True
+        losers = [p for p in state['processes'] if winner is None or p is not winner[1]]
+    for process in losers:
+        threading.Thread(target=release, args=(process,), daemon=True).start()
+    
+    return winner
+
 def read_ffmpeg_audio():
     """读取FFmpeg输出的音频数据"""
-    global ffmpeg_process, system_audio_queue
+    global ffmpeg_process
     
     if ffmpeg_process is None:
         console_print("FFmpeg进程为空，无法读取音频")
         return
     
+    audio_data_count = 0
+    # 复用的帧缓冲区，读取和写入环形缓冲区都不产生新对象
+    frame = bytearray(AUDIO_FRAME_BYTES)
+    frame_view = memoryview(frame)
+    
     try:
-        # 跳过WAV文件头（44字节）
-        header = ffmpeg_process.stdout.read(44)
-        if len(header) < 44:
-            console_print(f"警告: WAV文件头不完整，只读取到 {len(header)} 字节")
-            return
-        
+        # FFmpeg输出裸s16le数据，没有文件头，直接按帧读取
         console_print("开始读取FFmpeg音频数据...")
-        audio_data_count = 0
         
         while ffmpeg_process and ffmpeg_process.poll() is None:
             # 读取音频数据块（3200字节 = 16000Hz * 2字节 * 0.1秒）
             try:
-                data = ffmpeg_process.stdout.read(3200)
-                if data:
-                    system_audio_queue.put(data)
+                filled = read_pcm_frame(ffmpeg_process.stdout, frame_view)
+                if filled:
+                    system_audio_buffer.write(frame_view[:filled])
                     audio_data_count += 1
                     
                     # 每收到100个数据块打印一次状态（约10秒）
                     if audio_data_count % 100 == 0:
-                        console_print(f"已读取 {audio_data_count} 个音频数据块，队列大小: {system_audio_queue.qsize()}")
+                        stats = system_audio_buffer.stats()
+                        console_print(f"已读取 {audio_data_count} 个音频数据块，缓冲: {stats['depth_seconds']:.1f}s，"
+                                      f"峰值: {stats['high_water_samples']}，丢弃: {stats['dropped_samples']} 采样点")
                 else:
                     console_print("FFmpeg输出流结束")
                     break
@@ -910,28 +1644,18 @@ def stop_ffmpeg_audio_capture():
 
 def find_audio_device_by_name(device_name):
     """通过设备名称查找音频设备索引"""
-    try:
-        p = pyaudio.PyAudio()
-        for i in range(p.get_device_count()):
-            device_info = p.get_device_info_by_index(i)
-            if device_info['maxInputChannels'] > 0 and device_info['name'] == device_name:
-                p.terminate()
-                return i
-        p.terminate()
-        return None
-    except Exception as e:
-        console_print(f"查找音频设备失败: {e}")
-        return None
+    for device_info in device_registry.get('pyaudio_devices', default=[]):
+        if device_info['max_input_channels'] > 0 and device_info['name'] == device_name:
+            return device_info['index']
+    return None
 
 def check_vb_cable():
     """检查是否安装了VB-Cable"""
     try:
-        p = pyaudio.PyAudio()
         vb_cable_found = False
         vb_devices = []
         
-        for i in range(p.get_device_count()):
-            device_info = p.get_device_info_by_index(i)
+        for device_info in device_registry.get('pyaudio_devices', default=[]):
             device_name = device_info['name'].lower()
             
             # 检查VB-Cable相关设备
@@ -939,14 +1663,12 @@ def check_vb_cable():
             if any(indicator in device_name for indicator in vb_indicators):
                 vb_cable_found = True
                 vb_devices.append({
-                    'index': i,
+                    'index': device_info['index'],
                     'name': device_info['name'],
-                    'channels': device_info['maxInputChannels'],
-                    'type': 'input' if device_info['maxInputChannels'] > 0 else 'output'
+                    'channels': device_info['max_input_channels'],
+                    'type': 'input' if device_info['max_input_channels'] > 0 else 'output'
                 })
         
-        p.terminate()
-        
         if vb_cable_found:
             console_print("✅ 检测到VB-Cable虚拟音频设备:")
             for device in vb_devices:
@@ -963,9 +1685,9 @@ def check_vb_cable():
         return False, []
 
 # Function to get virtual audio devices
-def get_virtual_audio_devices():
+def get_virtual_audio_devices(block=True):
     """获取虚拟音频设备（VB-CABLE, Virtual Audio Cable等），优先检测VB-Cable"""
-    devices = get_system_audio_devices()
+    devices = get_system_audio_devices(block)
     virtual_devices = []
     
     # VB-Cable特定设备名称（优先检测）
@@ -1014,596 +1736,2224 @@ def get_virtual_audio_devices():
     
     return virtual_devices
 
-# Function to get available audio output devices
-def get_system_audio_devices():
-    """获取系统音频输出设备列表"""
+def probe_pyaudio_devices():
+    """使用PyAudio枚举所有音频设备的原始信息"""
+    p = pyaudio.PyAudio()
     try:
-        # 使用PyAudio获取设备信息
-        p = pyaudio.PyAudio()
         devices = []
-        
         for i in range(p.get_device_count()):
             device_info = p.get_device_info_by_index(i)
-            # 查找支持输入的设备（用于环回录音）
-            if device_info['maxInputChannels'] > 0:
-                devices.append({
-                    'index': i,
-                    'name': device_info['name'],
-                    'sample_rate': int(device_info['defaultSampleRate']),
-                    'type': 'input'
-                })
-            # 也添加输出设备信息供参考
-            elif device_info['maxOutputChannels'] > 0:
-                devices.append({
-                    'index': i,
-                    'name': device_info['name'] + ' (输出设备)',
-                    'sample_rate': int(device_info['defaultSampleRate']),
-                    'type': 'output'
-                })
-        
-        p.terminate()
+            devices.append({
+                'index': i,
+                'name': device_info['name'],
+                'max_input_channels': device_info['maxInputChannels'],
+                'max_output_channels': device_info['maxOutputChannels'],
+                'default_sample_rate': int(device_info['defaultSampleRate'])
+            })
         return devices
-    except Exception as e:
-        console_print(f"获取音频设备列表失败: {e}")
+    finally:
+        p.terminate()
+
+# Function to get available audio output devices
+def get_system_audio_devices(block=True):
+    """获取系统音频输出设备列表（结果由device_registry缓存，block=False时不在当前线程探测）"""
+    devices = []
+    for device_info in device_registry.get('pyaudio_devices', block=block, default=[]):
+        # 查找支持输入的设备（用于环回录音）
+        if device_info['max_input_channels'] > 0:
+            devices.append({
+                'index': device_info['index'],
+                'name': device_info['name'],
+                'sample_rate': device_info['default_sample_rate'],
+                'type': 'input'
+            })
+        # 也添加输出设备信息供参考
+        elif device_info['max_output_channels'] > 0:
+            devices.append({
+                'index': device_info['index'],
+                'name': device_info['name'] + ' (输出设备)',
+                'sample_rate': device_info['default_sample_rate'],
+                'type': 'output'
+            })
+    return devices
+
+def compute_pcm_levels(pcm, clip_threshold=32767):
+    """计算16bit PCM数据的(RMS, 峰值, 削波采样数)（有numpy时向量化计算）"""
+    if np is not None:
+        samples = np.frombuffer(pcm, dtype='<i2')
+        count = samples.size
+        if count:
+            floats = samples.astype(np.float64)
+            rms = float(np.sqrt(np.dot(floats, floats) / count))
+            magnitudes = np.abs(samples.astype(np.int32))
+            return rms, int(magnitudes.max()), int(np.count_nonzero(magnitudes >= clip_threshold))
+    else:
+        samples = array.array('h')
+        samples.frombytes(pcm)
+        count = len(samples)
+        if count:
+            rms = math.sqrt(sum(sample * sample for sample in samples) / count)
+            peak = max(max(samples), -min(samples))
+            return rms, peak, sum(1 for sample in samples if abs(sample) >= clip_threshold)
+    return 0.0, 0, 0
+
+class AudioLevelMeter:
+    """音频电平测量
+
+    逐帧向量化计算RMS、峰值、dBFS和削波采样数，最新结果通过snapshot()发布给日志和UI。
+    """
+
+    FULL_SCALE = 32768.0
+    SILENCE_DBFS = -100.0
+
+    def __init__(self, clip_threshold=32767):
+        self.clip_threshold = clip_threshold
+        self._lock = threading.Lock()
+        self._levels = {
+            'rms': 0.0,
+            'peak': 0,
+            'dbfs': self.SILENCE_DBFS,
+            'clipped': 0,
+            'clipped_total': 0,
+            'frames': 0,
+            'timestamp': None,
+        }
+
+    def measure(self, pcm):
+        """测量一帧16bit PCM数据并发布结果，返回电平字典"""
+        rms, peak, clipped = compute_pcm_levels(pcm, self.clip_threshold)
+        dbfs = 20 * math.log10(rms / self.FULL_SCALE) if rms > 0 else self.SILENCE_DBFS
+        
+        with self._lock:
+            levels = self._levels
+            levels['rms'] = rms
+            levels['peak'] = peak
+            levels['dbfs'] = max(dbfs, self.SILENCE_DBFS)
+            levels['clipped'] = clipped
+            levels['clipped_total'] += clipped
+            levels['frames'] += 1
+            levels['timestamp'] = time.monotonic()
+            return dict(levels)
+
+    def snapshot(self):
+        """返回最新发布的电平"""
+        with self._lock:
+            return dict(self._levels)
+
+# 发送线程测量，UI读取
+audio_level_meter = AudioLevelMeter()
+
+class VoiceActivityGate:
+    """发送前的语音活动检测（VAD）门
+
+    基于能量的双门限判决（开门门限高于关门门限，形成迟滞），可选频谱检查
+    （语音频段能量占比，需要numpy）。门关闭时静音帧不发送，只按保活间隔
+    稀疏发送一帧；开门时先补发pre-roll中缓存的帧，关门前保留hang-over，
+    避免吞掉字头字尾。
+    """
+
+    SPEECH_BAND = (300, 3400)  # 语音主要频段（Hz）
+
+    def __init__(self, open_dbfs=-45.0, close_dbfs=-52.0, pre_roll_ms=300, hangover_ms=600,
+                 frame_ms=100, spectral_check=False, speech_band_ratio=0.5,
+                 keepalive_interval=1.0, sample_rate=16000):
+        self.open_dbfs = open_dbfs
+        self.close_dbfs = min(close_dbfs, open_dbfs)
+        self.hangover_frames = max(0, round(hangover_ms / frame_ms))
+        self.spectral_check = spectral_check and np is not None
+        self.speech_band_ratio = speech_band_ratio
+        self.keepalive_interval = keepalive_interval
+        self.sample_rate = sample_rate
+        
+        self.pre_roll = collections.deque(maxlen=max(0, round(pre_roll_ms / frame_ms)))
+        self.active = False  # 门是否打开（正在发送语音）
+        self.silence_seconds = 0.0  # 连续静音时长
+        self.saved_seconds = 0.0  # 累计未发送的音频时长
+        self._hangover_left = 0
+        self._last_sent = 0.0
+        self._band_cache = {}  # 帧长 -> (窗函数, 语音频段掩码)
+
+    def _frame_seconds(self, frame):
+        return len(frame) / (self.sample_rate * 2)
+
+    def _speech_band_share(self, frame):
+        """语音频段能量占总能量的比例"""
+        samples = np.frombuffer(frame, dtype='<i2').astype(np.float32)
+        cached = self._band_cache.get(samples.size)
+        if cached is None:
+            freqs = np.fft.rfftfreq(samples.size, 1.0 / self.sample_rate)
+            cached = (np.hanning(samples.size).astype(np.float32),
+                      (freqs >= self.SPEECH_BAND[0]) & (freqs <= self.SPEECH_BAND[1]))
+            self._band_cache[samples.size] = cached
+        window, band = cached
+        power = np.abs(np.fft.rfft(samples * window)) ** 2
+        total = power.sum()
+        return float(power[band].sum() / total) if total > 0 else 0.0
+
+    def _is_speech(self, frame, dbfs):
+        threshold = self.close_dbfs if self.active else self.open_dbfs
+        if dbfs < threshold:
+            return False
+        # 只在开门判决时做频谱检查，避免说话过程中被误关
+        if self.spectral_check and not self.active:
+            return self._speech_band_share(frame) >= self.speech_band_ratio
+        return True
+
+    def process(self, frame, dbfs):
+        """输入一帧及其dBFS，返回需要发送的帧列表（可能为空，开门时包含pre-roll）"""
+        now = time.monotonic()
+        
+        if self._is_speech(frame, dbfs):
+            self.silence_seconds = 0.0
+            self._hangover_left = self.hangover_frames
+            self._last_sent = now
+            if not self.active:
+                self.active = True
+                frames = list(self.pre_roll)
+                self.pre_roll.clear()
+                self.saved_seconds -= sum(self._frame_seconds(f) for f in frames)
+                frames.append(frame)
+                return frames
+            return [frame]
+        
+        self.silence_seconds += self._frame_seconds(frame)
+        if self.active:
+            if self._hangover_left > 0:
+                self._hangover_left -= 1
+                self._last_sent = now
+                return [frame]
+            self.active = False
+        
+        # 门关闭：按保活间隔发送一帧，其余帧进入pre-roll
+        if self.keepalive_interval and now - self._last_sent >= self.keepalive_interval:
+            self._last_sent = now
+            return [frame]
+        self.pre_roll.append(frame)
+        self.saved_seconds += self._frame_seconds(frame)
         return []
 
+def create_voice_activity_gate():
+    """按配置创建VAD门，未启用时返回None"""
+    vad_config = config.get('vad', {})
+    if not vad_config.get('enabled', False):
+        return None
+    return VoiceActivityGate(
+        open_dbfs=vad_config.get('open_dbfs', -45.0),
+        close_dbfs=vad_config.get('close_dbfs', -52.0),
+        pre_roll_ms=vad_config.get('pre_roll_ms', 300),
+        hangover_ms=vad_config.get('hangover_ms', 600),
+        frame_ms=AUDIO_FRAME_BYTES * 1000 // (AUDIO_SAMPLE_RATE * 2),
+        spectral_check=vad_config.get('spectral_check', False),
+        speech_band_ratio=vad_config.get('speech_band_ratio', 0.5),
+        keepalive_interval=vad_config.get('keepalive_interval', 1.0),
+        sample_rate=AUDIO_SAMPLE_RATE
+    )
+
+class AudioReplayBuffer:
+    """translator重连用的音频回放缓冲
+
+    正常发送时只保留最近history_seconds秒已发送的音频；translator意外停止后，
+    断线期间（包括重试等待期间）采集的音频全部追加进来。新会话建立后进入追赶：
+    新采集的帧继续排在积压音频之后，每输入一帧就从缓冲中补发catch_up_rate帧（小数部分
+    累计到下一次，catch_up_rate为0时一次补发全部积压），发送线程不会睡眠等待。统计每次重连损失的时间，包括上游采集缓冲区溢出丢掉的音频。
+    """
+
+    def __init__(self, history_seconds=3.0, max_outage_seconds=30.0, catch_up_rate=2.0,
+                 sample_rate=16000, frame_bytes=3200, upstream=None):
+        self.history_bytes = int(history_seconds * sample_rate) * 2
+        self.catch_up_rate = catch_up_rate
+        self.sample_rate = sample_rate
+        self.frame_bytes = frame_bytes
+        self._ring = PCMRingBuffer(history_seconds + max_outage_seconds, sample_rate, 2, 'drop_oldest')
+        self.outage_started = None  # 本次断线开始的时间，None表示未断线
+        self._outage_dropped = 0  # 断线开始时缓冲区的丢弃计数（含当时的历史音频，历史被覆盖不算丢失）
+        self.upstream = upstream  # 上游采集缓冲区（PCMRingBuffer），断线期间它溢出丢掉的音频也算损失
+        self._upstream_dropped = 0
+        self.catching_up = False  # 新会话已建立，正在补发积压的音频
+        self._credit = 0.0  # 本次还可以补发的帧数
+        self._replayed_bytes = 0
+        self._reconnected_at = None
+        self.reconnects = 0
+        self.total_lost_seconds = 0.0
+
+    @property
+    def in_outage(self):
+        """translator是否处于意外断线状态"""
+        return self.outage_started is not None
+
+    def _upstream_dropped_samples(self):
+        return self.upstream.stats()['dropped_samples'] if self.upstream is not None else 0
+
+    def record_sent(self, frame):
+        """记录一帧已发送的音频，只保留最近的历史"""
+        self._ring.write(frame)
+        self._ring.trim(self.history_bytes)
+
+    def begin_outage(self):
+        """标记translator意外停止，此后采集的音频全部保留"""
+        if self.outage_started is None:
+            self.outage_started = time.monotonic()
+            stats = self._ring.stats()
+            self._outage_dropped = stats['dropped_samples'] + stats['depth_samples']
+            self._upstream_dropped = self._upstream_dropped_samples()
+            console_print(f"translator断线，开始缓存音频（已保留 {self._ring.depth_seconds:.1f}s 历史）")
+
+    def record_outage(self, frame):
+        """缓存断线期间采集的一帧音频"""
+        self._ring.write(frame)
+
+    def clear(self):
+        """丢弃缓存的音频（主动暂停或挂起后重建会话时不需要补发）"""
+        self._ring.clear()
+        self.outage_started = None
+        self.catching_up = False
+
+    def begin_catch_up(self):
+        """新会话已建立，开始追赶（补发随之后的每帧输入逐步进行，不阻塞）"""
+        if not self.catching_up:
+            self._replayed_bytes = 0
+        self.catching_up = True
+        self._credit = 0.0
+        self._reconnected_at = time.monotonic()
+        console_print(f"新会话已建立，开始补发 {self._ring.depth_seconds:.1f}s 积压音频")
+
+    def catch_up(self, translator, frames):
+        """追赶期间：新帧排在积压音频之后，再按追赶速率从缓冲中补发，积压清空后结束追赶"""
+        for frame in frames:
+            self._ring.write(frame)
+        unlimited = self.catch_up_rate <= 0
+        if not unlimited:
+            # 小数部分累计到下一次；积压清空时结束追赶，所以额度最多多出一帧
+            added = self.catch_up_rate * max(1, len(frames))
+            self._credit = min(self._credit + added, added + 1)
+        while (unlimited or self._credit >= 1) and self._ring.depth_bytes > 0:
+            frame = self._ring.read(min(self.frame_bytes, self._ring.depth_bytes), timeout=0)
+            if frame is None:
+                break
+            translator.send_audio_frame(frame.tobytes())
+            self._replayed_bytes += len(frame)
+            self._credit -= 1
+        if self._ring.depth_bytes == 0:
+            self._finish_catch_up()
+
+    def _finish_catch_up(self):
+        replayed = self._replayed_bytes / (self.sample_rate * 2)
+        if self.outage_started is not None:
+            # 断线超过缓存容量时最旧的音频被覆盖；上游采集缓冲区溢出丢掉的音频也没能进入这里
+            lost_samples = max(0, self._ring.stats()['dropped_samples'] - self._outage_dropped)
+            lost_samples += max(0, self._upstream_dropped_samples() - self._upstream_dropped)
+            lost = lost_samples / self.sample_rate
+            outage = self._reconnected_at - self.outage_started
+            catch_up = time.monotonic() - self._reconnected_at
+            self.reconnects += 1
+            self.total_lost_seconds += lost
+            console_print(f"重连完成：中断 {outage:.2f}s，追赶 {catch_up:.1f}s 补发 {replayed:.1f}s 音频，"
+                          f"丢失 {lost:.1f}s，累计重连 {self.reconnects} 次/丢失 {self.total_lost_seconds:.1f}s")
+            self.outage_started = None
+        self.catching_up = False
+
+def create_audio_replay_buffer():
+    """按配置创建translator重连用的音频回放缓冲"""
+    reconnect_config = config.get('reconnect', {})
+    catch_up_rate = reconnect_config.get('catch_up_rate', 2.0)
+    if 0 < catch_up_rate <= 1:
+        # 不超过实时速率时积压永远补发不完
+        console_print(f"catch_up_rate={catch_up_rate} 不大于实时速率，积压无法追上，改用 1.5")
+        catch_up_rate = 1.5
+    return AudioReplayBuffer(
+        history_seconds=reconnect_config.get('history_seconds', 3.0),
+        max_outage_seconds=reconnect_config.get('max_outage_seconds', 30.0),
+        catch_up_rate=catch_up_rate,
+        sample_rate=AUDIO_SAMPLE_RATE,
+        frame_bytes=AUDIO_FRAME_BYTES,
+        upstream=system_audio_buffer if audio_source == 'system' else None
+    )
+
+def probe_device_signal_levels(candidates, duration=2.0):
+    """同时打开所有候选输入设备一小段时间，测量每个设备的实际信号RMS
+    
+    candidates中的设备为 {'kind': 'dshow' 或 'pyaudio', 'name': ..., 'index': ...}，
+    返回 {设备名称: RMS}，无法打开或没有数据的设备不在结果中。
+    """
+    energy = {}  # 设备名称 -> [平方和, 采样点数]
+    lock = threading.Lock()
+    
+    def accumulate(name, pcm):
+        rms = compute_pcm_levels(pcm)[0]
+        count = len(pcm) // 2
+        with lock:
+            total = energy.setdefault(name, [0.0, 0])
+            total[0] += rms * rms * count
+            total[1] += count
+    
+    # FFmpeg DirectShow设备：每个设备一个FFmpeg进程和一个读取线程
+    processes = []
+    threads = []
+    
+    def read_dshow(candidate, process):
+        frame = memoryview(bytearray(AUDIO_FRAME_BYTES))
+        try:
+            while True:
+                filled = read_pcm_frame(process.stdout, frame)
+                if not filled:
+                    break
+                accumulate(candidate['name'], frame[:filled])
+        except Exception:
+            pass
+    
+    for candidate in candidates:
+        if candidate['kind'] != 'dshow':
+            continue
+        try:
+            process = subprocess.Popen(
+                build_ffmpeg_capture_cmd('dshow', f"audio={candidate['name']}"),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                bufsize=0
+            )
+        except Exception as e:
+            console_print(f"无法打开设备 {candidate['name']}: {e}")
+            continue
+        processes.append(process)
+        thread = threading.Thread(target=read_dshow, args=(candidate, process), daemon=True)
+        thread.start()
+        threads.append(thread)
+    
+    # PyAudio设备：使用回调模式同时打开所有输入流
+    p = None
+    streams = []
+    pyaudio_candidates = [c for c in candidates if c['kind'] == 'pyaudio']
+    if pyaudio_candidates:
+        try:
+            p = pyaudio.PyAudio()
+            for candidate in pyaudio_candidates:
+                def callback(in_data, frame_count, time_info, status, name=candidate['name']):
+                    accumulate(name, in_data)
+                    return (None, pyaudio.paContinue)
+                try:
+                    device_info = p.get_device_info_by_index(candidate['index'])
+                    streams.append(p.open(
+                        format=pyaudio.paInt16,
+                        channels=1,
+                        rate=int(device_info['defaultSampleRate']),
+                        input=True,
+                        input_device_index=candidate['index'],
+                        stream_callback=callback
+                    ))
+                except Exception as e:
+                    console_print(f"无法打开设备 {candidate['name']}: {e}")
+        except Exception as e:
+            console_print(f"初始化PyAudio失败: {e}")
+    
+    time.sleep(duration)
+    
+    for stream in streams:
+        try:
+            stream.stop_stream()
+            stream.close()
+        except Exception:
+            pass
+    if p is not None:
+        p.terminate()
+    for process in processes:
+        try:
+            process.terminate()
+            process.wait(timeout=3)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        except Exception:
+            pass
+    for thread in threads:
+        thread.join(timeout=1)
+    
+    with lock:
+        return {name: math.sqrt(total[0] / total[1]) for name, total in energy.items() if total[1] > 0}
+
+def auto_select_audio_device(duration=None):
+    """根据实际信号能量自动选择正在传输音频的输入设备，没有设备有信号时返回None"""
+    if duration is None:
+        duration = config.get('auto_select_duration', 2.0)
+    min_rms = config.get('auto_select_min_rms', 100)
+    
+    if check_ffmpeg():
+        candidates = [{'kind': 'dshow', 'name': dev['name'], 'index': dev['index']}
+                      for dev in get_windows_audio_devices()]
+    else:
+        candidates = [{'kind': 'pyaudio', 'name': dev['name'], 'index': dev['index']}
+                      for dev in get_system_audio_devices() if dev['type'] == 'input']
+    
+    if not candidates:
+        console_print("没有可供自动选择的输入设备")
+        return None
+    
+    console_print(f"🎯 正在检测 {len(candidates)} 个输入设备的信号（{duration:.1f}秒）...")
+    levels = probe_device_signal_levels(candidates, duration)
+    
+    best = None
+    for candidate in candidates:
+        rms = levels.get(candidate['name'])
+        if rms is None:
+            console_print(f"  {candidate['name']}: 无数据")
+            continue
+        console_print(f"  {candidate['name']}: RMS={rms:.1f}")
+        if rms >= min_rms and (best is None or rms > levels[best['name']]):
+            best = candidate
+    
+    if best is None:
+        console_print("❌ 所有设备都没有检测到音频信号")
+        return None
+    
+    console_print(f"✅ 自动选择设备: {best['name']} (RMS={levels[best['name']]:.1f})")
+    return best
+
 # Lock for controlling access to the PyAudio stream
 pyaudio_lock = threading.Lock()
 
 # Initialize global variables for microphone and audio stream
 mic = None
 audio_stream = None
-# Queue for text updates in wx
-wx_text_queue = queue.Queue()
-# Queue for fixed words from ASR
-asr_fixed_words = queue.Queue()
+class SubtitleMailbox:
+    """SDK回调线程与wx定时器之间的合并邮箱
 
+    回调线程投递增量，邮箱按(流, 句子序号)把它们折叠成该句最新的快照，同一句
+    在两次取件之间的多次更新只保留最后一份。UI每次定时器只取走有变化的句子，
+    内容哈希与上次渲染相同的快照直接跳过。流为'source'或目标语言代码。
+    """
 
-# Handle the ASR task. This function will get audio from microphone in while loop and send it to ASR.
-# The streaming output of ASR will be pushed back to the wx_text_queue and  asr_fixed_words
-def restart_translator(old_translator):
-    """重启translator"""
-    global translator_stopped, need_restart_translator
-    
-    try:
-        # 停止旧的translator
-        if old_translator and not translator_stopped:
-            console_print("正在停止旧的translator...")
-            old_translator.stop()
-        
-        # 重置状态
-        translator_stopped = False
-        need_restart_translator = False
-        
-        # 创建新的callback
-        class Callback(TranslationRecognizerCallback):
-            def __init__(self):
-                super().__init__()
-                self.sentence_ptr = 0
-                self.zh_word_ptr = 0
-                self.tg_word_ptr = 0
-
-            def on_open(self) -> None:
-                console_print('新的TranslationRecognizerCallback已打开')
-
-            def on_close(self) -> None:
-                global translator_stopped
-                console_print('TranslationRecognizerCallback关闭')
-                translator_stopped = True
-
-            def on_event(self, request_id, transcription_result, translation_result, usage) -> None:
-                new_chinese_words = ''
-                new_target_language_words = ''
-                is_sentence_end = False
-
-                if transcription_result != None:
-                    for i, word in enumerate(transcription_result.words):
-                        if word.fixed:
-                            if i >= self.zh_word_ptr:
-                                new_chinese_words += word.text
-                                self.zh_word_ptr += 1
-
-                if translation_result != None:
-                    target_language_translation = translation_result.get_translation('zh')
-                    if target_language_translation != None:
-                        for i, word in enumerate(target_language_translation.words):
-                            if word.fixed:
-                                if i >= self.tg_word_ptr:
-                                    asr_fixed_words.put([word.text, False])
-                                    new_target_language_words += word.text
-                                    self.tg_word_ptr += 1
-                        if target_language_translation.is_sentence_end:
-                            console_print('target_language sentence end')
-                            self.sentence_ptr += 1
-                            self.tg_word_ptr = 0
-                            self.zh_word_ptr = 0
-                            asr_fixed_words.put(['', True])
-                            is_sentence_end = True
-                wx_text_queue.put([transcription_result, translation_result])
-
-        callback = Callback()
-
-        # 创建新的translator
-        asr_model = config.get('asr_model', 'gummy-realtime-v1')
-        console_print(f"使用ASR模型: {asr_model}")
-        
-        new_translator = TranslationRecognizerRealtime(
-            model=asr_model,
-            format='pcm',
-            sample_rate=16000,
-            transcription_enabled=True,
-            translation_enabled=True,
-            translation_target_languages=[target_language],
-            semantic_punctuation_enabled=False,
-            callback=callback,
-        )
+    KEEP_RENDERED = 4  # 每个流保留最近几句的渲染哈希
 
-        console_print('重启translator...')
-        new_translator.start()
-        console_print(f'新translator request_id: {new_translator.get_last_request_id()}')
-        
-        return new_translator
-        
-    except Exception as e:
-        console_print(f"重启translator失败: {e}")
-        translator_stopped = True
-        return None
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current = {}  # 流 -> [句子序号, 固定文本, 未固定文本]
+        self._pending = collections.OrderedDict()  # (流, 句子序号) -> 快照
+        self._rendered = {}  # (流, 句子序号) -> 上次渲染的内容哈希
+        self.posted = 0  # 投递的增量数
+        self.coalesced = 0  # 被同一句后续更新覆盖的快照数
+        self.skipped = 0  # 内容未变化而跳过的渲染数
+        self._wake_hook = None  # UI降低刷新频率期间，下一次投递时调用
+
+    def sleep(self, wake_hook):
+        """UI准备降低刷新频率：下一次投递时调用wake_hook。有未取走的更新时返回False"""
+        with self._lock:
+            if self._pending:
+                return False
+            self._wake_hook = wake_hook
+            return True
 
-def gummyAsrTask():
-    global translator_stopped, need_restart_translator
-    translator_stopped = False
-    
-    class Callback(TranslationRecognizerCallback):
-        def __init__(self):
-            super().__init__()
-            # Initialize pointers for tracking words
-            self.sentence_ptr = 0
-            self.zh_word_ptr = 0
-            self.tg_word_ptr = 0
-
-        def on_open(self) -> None:
-            # When the recognizer opens, set up the audio stream
-            global mic
-            global audio_stream
-            global audio_source
-            global current_system_device
-            global current_system_device_name
+    def post(self, stream, delta):
+        """投递一个增量（回调线程调用）"""
+        with self._lock:
+            self.posted += 1
+            wake_hook, self._wake_hook = self._wake_hook, None
+            current = self._current.get(stream)
+            if current is None:
+                current = self._current[stream] = [0, '', '']
+            if delta['reset']:
+                current[1] = ''
+            current[1] += delta['fixed_append']
+            if delta['unfixed'] is not None:
+                current[2] = delta['unfixed']
+            self._put(stream, current, delta['sentence_end'])
+            
+            if delta['sentence_end']:
+                current[0] += 1
+                current[1] = ''
+                current[2] = ''
+            if delta['stash'] is not None:
+                current[1], current[2] = delta['stash']
+                self._put(stream, current, False)
+        if wake_hook is not None:
+            wake_hook()
+
+    def reset_stream(self, stream):
+        """丢弃一个流的句子序号和待取的快照，下一句从序号0开始（面板换用新历史时）"""
+        with self._lock:
+            self._current.pop(stream, None)
+            for key in [key for key in self._pending if key[0] == stream]:
+                del self._pending[key]
+            for key in [key for key in self._rendered if key[0] == stream]:
+                del self._rendered[key]
+
+    def _put(self, stream, current, ended):
+        key = (stream, current[0])
+        if key in self._pending:
+            self.coalesced += 1
+        self._pending[key] = {'fixed': current[1], 'unfixed': current[2], 'ended': ended}
+
+    def take(self):
+        """取走所有有变化的句子快照，返回[(流, 句子序号, 快照)]（UI线程调用）"""
+        with self._lock:
+            if not self._pending:
+                return []
+            items = list(self._pending.items())
+            self._pending.clear()
+        
+        updates = []
+        for (stream, index), snapshot in items:
+            digest = hash((snapshot['fixed'], snapshot['unfixed'], snapshot['ended']))
+            if self._rendered.get((stream, index)) == digest:
+                self.skipped += 1
+                continue
+            self._rendered[(stream, index)] = digest
+            self._rendered.pop((stream, index - self.KEEP_RENDERED), None)
+            updates.append((stream, index, snapshot))
+        return updates
+
+    def stats(self):
+        """返回投递、合并和跳过的计数"""
+        return {'posted': self.posted, 'coalesced': self.coalesced, 'skipped': self.skipped}
+
+# Mailbox for subtitle updates in wx
+subtitle_mailbox = SubtitleMailbox()
+# Queue for fixed words from ASR: [文本, 句子是否结束, 目标语言]
+asr_fixed_words = queue.Queue()
+
+
+def open_audio_input():
+    """打开音频输入（麦克风、FFmpeg系统音频或虚拟音频设备），与translator会话的生命周期无关"""
+    global mic
+    global audio_stream
+    global audio_source
+    global current_system_device
+    global current_system_device_name
+    
+    with pyaudio_lock:
+        if audio_source == 'microphone' or audio_source is None:
+            # 麦克风录音（包括未选择的情况默认使用麦克风）
+            mic = pyaudio.PyAudio()
+            audio_stream = mic.open(format=pyaudio.paInt16,
+                                    channels=1,
+                                    rate=16000,
+                                    input=True)
+            console_print("已连接到麦克风")
             
-            with pyaudio_lock:
-                console_print('TranslationRecognizerCallback open.')
+        elif audio_source == 'system':
+            # 使用FFmpeg捕获系统音频
+            console_print("尝试使用FFmpeg捕获系统音频...")
+            
+            if check_ffmpeg():
+                device_name = None
+                
+                # 自动选择模式：绑定到实际有信号的设备
+                auto_device = auto_select_audio_device() if config.get('auto_select_device') else None
+                if auto_device is not None:
+                    device_name = auto_device['name']
+                    current_system_device = auto_device['index']
+                    current_system_device_name = device_name
+                    save_config()
+                # 优先使用保存的设备名称
+                elif current_system_device_name is not None:
+                    device_name = current_system_device_name
+                    console_print(f"使用配置中保存的音频设备: {device_name}")
+                elif current_system_device is not None:
+                    # 如果只有索引，尝试通过索引获取设备名称
+                    devices = get_windows_audio_devices()
+                    if current_system_device < len(devices):
+                        device_name = devices[current_system_device]['name']
+                        # 同时保存设备名称以备下次使用
+                        current_system_device_name = device_name
+                        # 自动保存到配置文件
+                        save_config()
+                        console_print(f"通过索引获取到音频设备: {device_name}")
+                else:
+                    console_print("未配置特定的音频设备，将使用FFmpeg的自动检测")
                 
-                if audio_source == 'microphone' or audio_source is None:
-                    # 麦克风录音（包括未选择的情况默认使用麦克风）
+                success = start_ffmpeg_audio_capture(device_name)
+                if success:
+                    console_print("FFmpeg系统音频捕获启动成功")
+                    # 不需要设置PyAudio流，因为我们使用FFmpeg
+                    mic = None
+                    audio_stream = None
+                else:
+                    console_print("FFmpeg启动失败，回退到麦克风")
+                    # 回退到麦克风
                     mic = pyaudio.PyAudio()
                     audio_stream = mic.open(format=pyaudio.paInt16,
                                             channels=1,
                                             rate=16000,
                                             input=True)
-                    console_print("已连接到麦克风")
-                    
-                elif audio_source == 'system':
-                    # 使用FFmpeg捕获系统音频
-                    console_print("尝试使用FFmpeg捕获系统音频...")
-                    
-                    if check_ffmpeg():
-                        device_name = None
-                        
-                        # 优先使用保存的设备名称
-                        if current_system_device_name is not None:
-                            device_name = current_system_device_name
-                            console_print(f"使用配置中保存的音频设备: {device_name}")
-                        elif current_system_device is not None:
-                            # 如果只有索引，尝试通过索引获取设备名称
-                            devices = get_windows_audio_devices()
-                            if current_system_device < len(devices):
-                                device_name = devices[current_system_device]['name']
-                                # 同时保存设备名称以备下次使用
-                                current_system_device_name = device_name
-                                # 自动保存到配置文件
-                                save_config()
-                                console_print(f"通过索引获取到音频设备: {device_name}")
-                        else:
-                            console_print("未配置特定的音频设备，将使用FFmpeg的自动检测")
-                        
-                        success = start_ffmpeg_audio_capture(device_name)
-                        if success:
-                            console_print("FFmpeg系统音频捕获启动成功")
-                            # 不需要设置PyAudio流，因为我们使用FFmpeg
-                            mic = None
-                            audio_stream = None
-                        else:
-                            console_print("FFmpeg启动失败，回退到麦克风")
-                            # 回退到麦克风
-                            mic = pyaudio.PyAudio()
-                            audio_stream = mic.open(format=pyaudio.paInt16,
-                                                    channels=1,
-                                                    rate=16000,
-                                                    input=True)
-                    else:
-                        console_print("未找到FFmpeg，尝试虚拟音频设备...")
-                        
-                        # 尝试使用虚拟音频设备
-                        virtual_devices = get_virtual_audio_devices()
-                        device_index = None
-                        
-                        # 优先使用保存的设备名称查找设备
-                        if current_system_device_name is not None:
-                            device_index = find_audio_device_by_name(current_system_device_name)
-                            if device_index is not None:
-                                console_print(f"通过设备名称找到虚拟音频设备: {current_system_device_name} (索引: {device_index})")
+            else:
+                console_print("未找到FFmpeg，尝试虚拟音频设备...")
+                
+                # 尝试使用虚拟音频设备
+                virtual_devices = get_virtual_audio_devices()
+                device_index = None
+                
+                # 自动选择模式：绑定到实际有信号的设备
+                auto_device = auto_select_audio_device() if config.get('auto_select_device') else None
+                if auto_device is not None:
+                    device_index = auto_device['index']
+                    console_print(f"自动选择的音频设备: {auto_device['name']} (索引: {device_index})")
+                # 优先使用保存的设备名称查找设备
+                elif current_system_device_name is not None:
+                    device_index = find_audio_device_by_name(current_system_device_name)
+                    if device_index is not None:
+                        console_print(f"通过设备名称找到虚拟音频设备: {current_system_device_name} (索引: {device_index})")
+                
+                # 如果通过名称找不到，且有索引配置，则使用索引
+                if device_index is None and current_system_device is not None:
+                    device_index = current_system_device
+                    console_print(f"使用配置的设备索引: {device_index}")
+                
+                if virtual_devices and device_index is not None:
+                    try:
+                        mic = pyaudio.PyAudio()
+                        device_info = mic.get_device_info_by_index(device_index)
+                        console_print(f"尝试连接到虚拟音频设备: {device_info['name']}")
                         
-                        # 如果通过名称找不到，且有索引配置，则使用索引
-                        if device_index is None and current_system_device is not None:
-                            device_index = current_system_device
-                            console_print(f"使用配置的设备索引: {device_index}")
+                        audio_stream = mic.open(
+                            format=pyaudio.paInt16,
+                            channels=1,
+                            rate=16000,
+                            input=True,
+                            input_device_index=device_index,
+                            frames_per_buffer=3200
+                        )
+                        console_print(f"已连接到虚拟音频设备: {device_info['name']}")
                         
-                        if virtual_devices and device_index is not None:
-                            try:
-                                mic = pyaudio.PyAudio()
-                                device_info = mic.get_device_info_by_index(device_index)
-                                console_print(f"尝试连接到虚拟音频设备: {device_info['name']}")
-                                
-                                audio_stream = mic.open(
-                                    format=pyaudio.paInt16,
-                                    channels=1,
-                                    rate=16000,
-                                    input=True,
-                                    input_device_index=device_index,
-                                    frames_per_buffer=3200
-                                )
-                                console_print(f"已连接到虚拟音频设备: {device_info['name']}")
-                                
-                                # 保存设备名称以备下次使用
-                                if current_system_device_name != device_info['name']:
-                                    current_system_device_name = device_info['name']
-                                    # 自动保存到配置文件
-                                    save_config()
-                            except Exception as e:
-                                console_print(f"连接虚拟音频设备失败: {e}")
-                                # 最后回退到麦克风
-                                mic = pyaudio.PyAudio()
-                                audio_stream = mic.open(format=pyaudio.paInt16,
-                                                        channels=1,
-                                                        rate=16000,
-                                                        input=True)
-                                console_print("回退到麦克风录音")
-                        else:
-                            # 最后回退到麦克风
-                            mic = pyaudio.PyAudio()
-                            audio_stream = mic.open(format=pyaudio.paInt16,
-                                                    channels=1,
-                                                    rate=16000,
-                                                    input=True)
-                            console_print("回退到麦克风录音")
+                        # 保存设备名称以备下次使用
+                        if current_system_device_name != device_info['name']:
+                            current_system_device_name = device_info['name']
+                            # 自动保存到配置文件
+                            save_config()
+                    except Exception as e:
+                        console_print(f"连接虚拟音频设备失败: {e}")
+                        # 最后回退到麦克风
+                        mic = pyaudio.PyAudio()
+                        audio_stream = mic.open(format=pyaudio.paInt16,
+                                                channels=1,
+                                                rate=16000,
+                                                input=True)
+                        console_print("回退到麦克风录音")
                 else:
-                    # 默认使用麦克风
+                    # 最后回退到麦克风
                     mic = pyaudio.PyAudio()
                     audio_stream = mic.open(format=pyaudio.paInt16,
                                             channels=1,
                                             rate=16000,
                                             input=True)
-                    console_print("使用默认麦克风")
-
-        def on_close(self) -> None:
-            # Clean up the audio stream and microphone
-            global mic
-            global audio_stream
-            global translator_stopped
-            console_print('TranslationRecognizerCallback close.')
-            translator_stopped = True  # 标记translator已停止
-            
-            # 停止FFmpeg进程
+                    console_print("回退到麦克风录音")
+        else:
+            # 默认使用麦克风
+            mic = pyaudio.PyAudio()
+            audio_stream = mic.open(format=pyaudio.paInt16,
+                                    channels=1,
+                                    rate=16000,
+                                    input=True)
+            console_print("使用默认麦克风")
+
+def close_audio_input():
+    """关闭音频输入并释放资源"""
+    global mic
+    global audio_stream
+    
+    # 停止FFmpeg进程
+    try:
+        stop_ffmpeg_audio_capture()
+    except Exception as e:
+        console_print(f"停止FFmpeg时出错: {e}")
+    
+    if audio_stream is None:
+        console_print('audio_stream is None')
+        return
+        
+    try:
+        if audio_stream is not None:
+            audio_stream.stop_stream()
+            audio_stream.close()
+            audio_stream = None
+        if mic is not None:
+            mic.terminate()
+            mic = None
+    except Exception as e:
+        console_print(f"清理音频资源时出错: {e}")
+
+class WordDiffer:
+    """增量词差分器
+
+    记住当前句子已固定的词数，每次只从上次的固定位置开始扫描，输出紧凑的增量：
+    fixed_append（新固定的文本）、unfixed（未固定部分，没有变化时为None）、
+    sentence_end（句子结束）、stash（下一句的临时文本 (固定, 未固定)，没有时为None）、
+    reset（为True时当前行已显示的固定文本作废，从fixed_append重新开始）、
+    tts_append（本句还没有交给TTS的固定文本，reset后重发的部分不会再朗读一次）。
+    新会话的第一个增量总是reset，避免接在上一个会话未结束的行后面。
+    """
+
+    def __init__(self):
+        self.fixed_count = 0  # 当前句子已固定的词数
+        self.unfixed_text = ''
+        self.fixed_text = ''  # 当前行已显示的固定文本
+        self.spoken_chars = 0  # 本句已交给TTS的字符数，句子结束前不随reset回退
+        self._reset_next = True  # 新会话、上一句结束或显示了stash后，下一个增量需要重置当前行
+
+    def diff(self, result):
+        """对比一次识别/翻译结果，返回增量字典，没有任何变化时返回None"""
+        words = result.words
+        reset = self._reset_next
+        if len(words) < self.fixed_count:
+            # 已固定的词被服务端撤回，整句重新开始
+            self.fixed_count = 0
+            reset = True
+        
+        fixed_parts = []
+        i = self.fixed_count
+        while i < len(words) and words[i].fixed:
+            fixed_parts.append(words[i].text)
+            i += 1
+        self.fixed_count = i
+        unfixed_text = ''.join(word.text for word in words[i:])
+        fixed_append = ''.join(fixed_parts)
+        self.fixed_text = fixed_append if reset else self.fixed_text + fixed_append
+        
+        delta = {
+            'fixed_append': fixed_append,
+            'unfixed': unfixed_text if unfixed_text != self.unfixed_text or reset else None,
+            'sentence_end': bool(result.is_sentence_end),
+            'stash': None,
+            'reset': reset,
+            'tts_append': self.fixed_text[self.spoken_chars:],
+        }
+        self.spoken_chars = max(self.spoken_chars, len(self.fixed_text))
+        self.unfixed_text = unfixed_text
+        self._reset_next = False
+        
+        if result.stash is not None:
+            stash_fixed = ''
+            stash_unfixed = ''
+            for word in result.stash.words:
+                if word['fixed']:
+                    stash_fixed += word.text
+                else:
+                    stash_unfixed += word.text
+            delta['stash'] = (stash_fixed, stash_unfixed)
+        
+        if delta['sentence_end'] or delta['stash'] is not None:
+            # 当前行会被清空（新句子或stash覆盖），下一个增量从句首重新发送整句的固定文本
+            self.fixed_count = 0
+            self.unfixed_text = ''
+            self._reset_next = True
+        if delta['sentence_end']:
+            self.spoken_chars = 0
+        
+        if not (delta['fixed_append'] or delta['unfixed'] is not None or delta['sentence_end']
+                or delta['stash'] is not None or reset):
+            return None
+        return delta
+
+# Handle the ASR task. This function will get audio from microphone in while loop and send it to ASR.
+# The streaming output of ASR will be pushed back to the subtitle_mailbox and  asr_fixed_words
+class AsrCallback(TranslationRecognizerCallback):
+    """translator会话的结果回调，所有会话（首次启动、重连、备用、轮换）共用"""
+
+    def __init__(self, tts_sink=None):
+        super().__init__()
+        # 给TTS的固定词队列（需要put方法），默认是线程运行时的asr_fixed_words
+        self.tts_sink = tts_sink if tts_sink is not None else asr_fixed_words
+        # 源语言和每种目标语言各自的增量差分器，只输出新固定和变化的文本
+        self.source_differ = WordDiffer()
+        self.target_differs = {}
+        self.sentence_ptr = 0
+        self.standby = False  # 预热中的备用会话，结果不输出
+        self.retired = False  # 已被轮换下来的旧会话，关闭时不影响当前会话
+        self.closed = False
+        self.at_sentence_boundary = True  # 当前没有未结束的句子，可以安全轮换会话
+
+    def on_open(self) -> None:
+        # 音频输入由gummyAsrTask统一打开，会话重启或挂起时不需要重新打开
+        console_print('TranslationRecognizerCallback open.')
+
+    def on_close(self) -> None:
+        console_print('TranslationRecognizerCallback close.')
+        self.closed = True
+        if self.standby or self.retired:
+            return
+        session_manager.session_lost('会话意外关闭')
+
+    def on_event(
+        self,
+        request_id,
+        transcription_result: TranscriptionResult,
+        translation_result: TranslationResult,
+        usage,
+    ) -> None:
+        if self.standby or self.retired:
+            return  # 已被替换下来的会话不再输出，避免和当前会话的句子交错
+        
+        # 添加调试信息：显示收到的事件
+        event_counter = getattr(self, '_event_counter', 0)
+        event_counter += 1
+        setattr(self, '_event_counter', event_counter)
+        
+        if event_counter % 10 == 0 or event_counter <= 5:
+            console_print(f"收到第 {event_counter} 个ASR事件, request_id: {request_id}")
+            if transcription_result:
+                console_print(f"  转录结果: 有 {len(transcription_result.words)} 个词")
+            if translation_result:
+                console_print(f"  翻译结果: 存在")
+
+        # 源语言：只把增量交给UI
+        if transcription_result != None:
+            delta = self.source_differ.diff(transcription_result)
+            if delta is not None:
+                if delta['fixed_append']:
+                    console_print(f"新的固定源语言文本: {delta['fixed_append']}")
+                subtitle_mailbox.post('source', delta)
+
+        # 译文：只处理有订阅者的目标语言，增量按订阅分发给字幕面板和TTS
+        if translation_result != None:
+            primary_language = target_language
+            for language in result_subscriptions.languages:
+                target_language_translation = translation_result.get_translation(language)
+                if target_language_translation == None:
+                    continue
+                differ = self.target_differs.get(language)
+                if differ is None:
+                    differ = self.target_differs[language] = WordDiffer()
+                delta = differ.diff(target_language_translation)
+                if delta is None:
+                    continue
+                
+                to_tts = result_subscriptions.wants('tts', language)
+                if delta['fixed_append']:
+                    console_print(f"新的固定翻译文本[{language}]: {delta['fixed_append']}")
+                # reset时UI重写整行，TTS只读还没读过的部分
+                if to_tts and delta['tts_append']:
+                    self.tts_sink.put([delta['tts_append'], False, language])
+                # Check if the current sentence has ended
+                if delta['sentence_end']:
+                    console_print(f'{language} sentence end')
+                    if to_tts:
+                        self.tts_sink.put(['', True, language])
+                # 会话轮换按主目标语言的句子边界判断
+                if language == primary_language:
+                    if delta['fixed_append']:
+                        self.at_sentence_boundary = False
+                    if delta['sentence_end']:
+                        self.sentence_ptr += 1
+                        self.at_sentence_boundary = True
+                if result_subscriptions.wants('ui', language):
+                    subtitle_mailbox.post(language, delta)
+
+def start_translator_session(callback):
+    """按当前配置创建并启动translator会话"""
+    asr_model = config.get('asr_model', 'gummy-realtime-v1')
+    console_print(f"使用ASR模型: {asr_model}")
+    
+    languages = get_target_languages()
+    translator = TranslationRecognizerRealtime(
+        model=asr_model,
+        format='pcm',
+        sample_rate=16000,
+        transcription_enabled=True,
+        translation_enabled=True,
+        translation_target_languages=languages,
+        semantic_punctuation_enabled=False,
+        callback=callback,
+    )
+    translator.start()
+    setattr(translator, '_session_callback', callback)
+    setattr(translator, '_session_started', time.monotonic())
+    setattr(translator, '_session_languages', languages)
+    console_print(f'translator request_id: {translator.get_last_request_id()}')
+    return translator
+
+def retire_translator(translator):
+    """在后台停止被替换下来的会话，之后它的结果不再输出"""
+    callback = getattr(translator, '_session_callback', None)
+    if callback is not None:
+        callback.retired = True  # 旧会话关闭时不影响当前会话的状态，结果也不再输出
+        if not callback.at_sentence_boundary:
+            # 旧会话有未结束的句子：让TTS把已收到的部分先合成，不和新会话的文本拼在一起
+            for language in get_target_languages():
+                if result_subscriptions.wants('tts', language):
+                    callback.tts_sink.put(['', True, language])
+    
+    def stop():
+        try:
+            translator.stop()
+        except Exception as e:
+            console_print(f"停止旧translator会话时出错: {e}")
+    
+    threading.Thread(target=stop, daemon=True).start()
+
+class TranslatorStandby:
+    """预热的备用translator会话
+
+    在后台提前完成websocket握手和会话初始化，重连或轮换时直接接管，
+    音频不再在建连期间堆积。备用期间按间隔发送静音帧，避免服务端因空闲关闭。
+    """
+
+    def __init__(self, callback_factory, enabled=False, keepalive_interval=1.0, max_age=None, frame_bytes=3200):
+        self.callback_factory = callback_factory
+        self.enabled = enabled  # 是否在每次取用后立即预热下一个备用会话
+        self.keepalive_interval = keepalive_interval
+        self.max_age = max_age  # 备用会话的最长存活时间，超过后重新预热
+        self._silence = bytes(frame_bytes)
+        self._warm = None
+        self._warming = False
+        self._closed = False
+        self._last_keepalive = 0.0
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+
+    def _build(self, standby):
+        callback = self.callback_factory()
+        callback.standby = standby
+        return start_translator_session(callback)
+
+    def _usable(self, translator):
+        callback = translator._session_callback
+        if callback.closed:
+            return False
+        if translator._session_languages != get_target_languages():
+            return False  # 预热后目标语言设置已变化
+        return self.max_age is None or time.monotonic() - translator._session_started < self.max_age
+
+    def prepare(self):
+        """在后台预热一个备用会话（已有或正在预热时不重复）"""
+        with self._lock:
+            if self._closed or self._warm is not None or self._warming:
+                return
+            self._warming = True
+        threading.Thread(target=self._warm_up, daemon=True).start()
+
+    def _warm_up(self):
+        started = time.monotonic()
+        try:
+            translator = self._build(standby=True)
+            console_print(f"备用translator会话已就绪，预热耗时 {time.monotonic() - started:.2f}s")
+        except Exception as e:
+            console_print(f"预热备用translator会话失败: {e}")
+            translator = None
+        
+        with self._lock:
+            self._warming = False
+            if self._closed and translator is not None:
+                retire_translator(translator)
+                translator = None
+            self._warm = translator
+            self._ready.notify_all()
+
+    def take(self, timeout=5.0):
+        """取出就绪的备用会话（正在预热时最多等待timeout秒），没有可用的备用会话时同步新建"""
+        with self._lock:
+            if self._warm is None and self._warming:
+                self._ready.wait_for(lambda: not self._warming, timeout)
+            translator, self._warm = self._warm, None
+        
+        if translator is not None and not self._usable(translator):
+            retire_translator(translator)
+            translator = None
+        if translator is not None:
+            translator._session_callback.standby = False
+            # 保留会话真实的开始时间：服务端的时长限制从握手时算起，轮换预算要扣除备用期间的时长
+            age = time.monotonic() - translator._session_started
+            console_print(f"切换到预热的备用translator会话（已建立 {age:.0f}s）")
+        else:
+            console_print("创建translator会话...")
+            translator = self._build(standby=False)
+        
+        if self.enabled:
+            self.prepare()
+        return translator
+
+    def keepalive(self):
+        """给备用会话发送静音帧；备用会话失效或过期时重新预热"""
+        translator = self._warm
+        if translator is None or not self.keepalive_interval:
+            return
+        now = time.monotonic()
+        if now - self._last_keepalive < self.keepalive_interval:
+            return
+        self._last_keepalive = now
+        
+        try:
+            if not self._usable(translator):
+                raise RuntimeError("备用会话已关闭或过期")
+            translator.send_audio_frame(self._silence)
+        except Exception as e:
+            console_print(f"备用translator会话不可用（{e}），重新预热")
+            with self._lock:
+                if self._warm is translator:
+                    self._warm = None
+            retire_translator(translator)
+            self.prepare()
+
+    def release(self):
+        """关闭当前的备用会话（如会话挂起期间不需要保持连接）"""
+        with self._lock:
+            translator, self._warm = self._warm, None
+        if translator is not None:
+            retire_translator(translator)
+
+    def close(self):
+        """关闭备用会话并停止预热"""
+        with self._lock:
+            self._closed = True
+        self.release()
+
+def rotate_translator(old_translator, standby):
+    """切换到备用会话并在后台关闭旧会话，失败时继续使用旧会话"""
+    age = time.monotonic() - getattr(old_translator, '_session_started', time.monotonic())
+    try:
+        new_translator = standby.take()
+    except Exception as e:
+        console_print(f"轮换translator会话失败: {e}，继续使用当前会话")
+        return old_translator
+    retire_translator(old_translator)
+    console_print(f"translator会话已轮换（旧会话时长 {age:.0f}s）")
+    return new_translator
+
+def restart_translator(old_translator, standby, replay_buffer=None):
+    """重建translator会话，优先使用预热的备用会话；会话意外中断时把回放缓冲中的音频补发到新会话"""
+    try:
+        # 停止旧的translator
+        if old_translator is not None and session_manager.session_alive:
+            console_print("正在停止旧的translator...")
+            old_translator.stop()
+        
+        session_manager.transition(SessionManager.CONNECTING, '建立新会话')
+        console_print('重启translator...')
+        new_translator = standby.take()
+        
+        if replay_buffer is not None:
+            if replay_buffer.in_outage:
+                replay_buffer.begin_catch_up()
+            else:
+                replay_buffer.clear()
+        
+        session_manager.session_started()
+        return new_translator
+        
+    except Exception as e:
+        console_print(f"重启translator失败: {e}")
+        session_manager.transition(SessionManager.RESTARTING, '建立会话失败')
+        return None
+
+def read_audio_input(timeout=0.1):
+    """读取一帧输入音频，没有数据（超时或被会话状态变化唤醒）时返回None
+
+    timeout只用于系统音频环形缓冲区，None表示一直等到有数据或被唤醒。
+    """
+    if audio_source == 'system' and ffmpeg_process is not None:
+        # 从FFmpeg环形缓冲区读取音频数据
+        frame = system_audio_buffer.read(AUDIO_FRAME_BYTES, timeout=timeout)
+        if frame is None:
+            return None
+        # SDK会把音频帧放入自己的发送队列异步发送，这里必须交给它独立的副本
+        return frame.tobytes()
+    if audio_stream:
+        # 从PyAudio流读取音频数据
+        return audio_stream.read(3200, exception_on_overflow=False)
+    raise RuntimeError("没有可用的音频输入")
+
+def prepare_asr_input():
+    """检查API状态并打开音频输入，返回是否可以开始识别"""
+    # 检查API状态
+    check_api_status()
+    
+    # 如果API调用被禁用，给出警告
+    if not enable_api_calls:
+        console_print("⚠️  警告: API调用已禁用，translator将不会工作。请在设置中启用API调用。")
+        return False  # 直接返回，不启动translator
+
+    # 打开音频输入。采集与translator会话的生命周期无关，会话重启或挂起时保持采集
+    try:
+        open_audio_input()
+    except Exception as e:
+        console_print(f"打开音频输入失败: {e}")
+        return False
+
+    session_manager.auto_restart = config.get('reconnect', {}).get('auto', True)
+    return True
+
+class AsrAudioSender:
+    """按会话状态把输入音频送入translator
+
+    负责VAD门控、会话轮换、静音挂起/恢复和断线期间的音频缓存。线程运行时和
+    asyncio运行时共用，所有方法必须在同一个线程中调用。tts_sink为会话回调
+    投递TTS固定词的队列（None时使用asr_fixed_words）。
+    """
+
+    def __init__(self, tts_sink=None):
+        # 备用会话用于重连和在服务端时长限制前主动轮换
+        rotation_config = config.get('session_rotation', {})
+        self.max_session_seconds = rotation_config.get('max_session_seconds', 3000)
+        self.warmup_lead_seconds = rotation_config.get('warmup_lead_seconds', 60)
+        self.boundary_window_seconds = rotation_config.get('boundary_window_seconds', 30)
+        self.standby = TranslatorStandby(
+            lambda: AsrCallback(tts_sink),
+            enabled=rotation_config.get('standby', False),
+            keepalive_interval=rotation_config.get('standby_keepalive_interval', 1.0),
+            max_age=self.max_session_seconds / 2 if self.max_session_seconds > 0 else None,
+            frame_bytes=AUDIO_FRAME_BYTES
+        )
+        
+        # 发送前的语音活动检测，静音帧不发送
+        self.voice_gate = create_voice_activity_gate()
+        # 连续静音超过该时长后挂起会话，检测到语音时再恢复（需要启用VAD）
+        self.idle_suspend_seconds = config.get('idle_suspend_seconds', 120) if self.voice_gate is not None else 0
+        # 保留最近发送和断线期间采集的音频，重连后补发
+        self.replay_buffer = create_audio_replay_buffer()
+        self.max_retry_delay = config.get('reconnect', {}).get('max_retry_delay', 30)
+        self.retry_delay = 1
+        
+        self.translator = None
+        self.saved_mic_audio_file = None
+
+    def start(self):
+        """建立首个会话，失败时返回False"""
+        console_print('translator start')
+        self.translator = restart_translator(None, self.standby)
+        if self.translator is None:
+            return False
+        # Open a file to save microphone audio data
+        self.saved_mic_audio_file = open('mic_audio.pcm', 'wb')
+        return True
+
+    def trim_paused_backlog(self):
+        """暂停期间清理系统音频缓冲中积压的旧数据"""
+        if audio_source == 'system':
+            if system_audio_buffer.depth_bytes > 50 * AUDIO_FRAME_BYTES:  # 缓冲超过约5秒的数据
+                # 保留最新的20个数据块（约2秒），丢弃其余的
+                discarded = system_audio_buffer.trim(20 * AUDIO_FRAME_BYTES)
+                if discarded > 0:
+                    console_print(f"暂停期间清理了 {discarded // AUDIO_FRAME_BYTES} 个音频数据块，当前缓冲: {system_audio_buffer.depth_seconds:.1f}s")
+
+    def restart(self):
+        """重建会话，成功返回0，失败返回下次重试前应等待的秒数"""
+        # 会话意外中断时，断线期间的音频进入回放缓冲，重连后补发
+        if session_manager.outage:
+            self.replay_buffer.begin_outage()
+        console_print("检测到需要重启translator...")
+        new_translator = restart_translator(self.translator, self.standby, self.replay_buffer)
+        if new_translator is None:
+            # 重连失败时按指数退避重试
+            delay = self.retry_delay
+            console_print(f"重启translator失败，{delay}秒后重试")
+            self.retry_delay = min(self.retry_delay * 2, self.max_retry_delay)
+            return delay
+        self.translator = new_translator
+        self.retry_delay = 1
+        return 0
+
+    def keepalive(self):
+        """备用会话保活（没有备用会话时直接返回）"""
+        self.standby.keepalive()
+
+    def wait_for_retry(self, delay, read_frame):
+        """重连退避等待期间继续读取音频放进回放缓冲，避免上游采集缓冲区溢出丢音频
+
+        read_frame()返回一帧输入或None（超时/被唤醒），会话状态离开restarting时提前返回。
+        """
+        deadline = time.monotonic() + delay
+        while session_manager.state == SessionManager.RESTARTING and time.monotonic() < deadline:
+            data = read_frame()
+            if data:
+                self.process(data)
+
+    def _send(self, frames):
+        if self.replay_buffer.catching_up:
+            # 重连后的追赶：新帧排在积压音频之后按追赶速率补发
+            self.replay_buffer.catch_up(self.translator, frames)
+            return
+        while frames:
+            self.translator.send_audio_frame(frames[0])
+            self.replay_buffer.record_sent(frames.pop(0))
+
+    def process(self, data):
+        """按当前会话状态处理一帧输入音频（顺带给备用会话保活）"""
+        self.keepalive()
+        # 保存的是VAD门之前的原始输入，与是否发送无关
+        if self.saved_mic_audio_file is not None:
+            self.saved_mic_audio_file.write(data)
+        state = session_manager.state
+        voice_gate = self.voice_gate
+        
+        # 会话因长时间静音已挂起：只做VAD检测，检测到语音时建立新会话并补发pre-roll
+        if state == SessionManager.IDLE:
+            if voice_gate is not None:
+                levels = audio_level_meter.measure(data)
+                frames = voice_gate.process(data, levels['dbfs'])
+                if voice_gate.active:
+                    console_print(f"检测到语音，恢复translator会话（补发 {len(frames)} 帧）")
+                    translator = restart_translator(None, self.standby, self.replay_buffer)
+                    if translator is None:
+                        return  # 进入restarting，由重连流程重试
+                    self.translator = translator
+                    self._send(frames)
+            return
+        
+        # 会话在读取期间中断：缓存音频，重连后补发
+        if state != SessionManager.STREAMING:
+            if session_manager.outage:
+                self.replay_buffer.begin_outage()
+                self.replay_buffer.record_outage(data)
+            return
+        
+        translator = self.translator
+        frames = []
+        try:
+            if len(data) >= 2:
+                # 计算音频电平（RMS、峰值、dBFS、削波），结果同时发布给UI
+                levels = audio_level_meter.measure(data)
+                rms = levels['rms']
+                
+                # 添加调试信息：显示发送的音频数据大小和音量
+                sent_frame_counter = getattr(translator, '_sent_frame_counter', 0)
+                sent_frame_counter += 1
+                setattr(translator, '_sent_frame_counter', sent_frame_counter)
+                
+                # 每100帧显示一次调试信息，但如果检测到有声音则立即显示
+                if sent_frame_counter % 100 == 0 or (rms > 1000 and sent_frame_counter % 10 == 0):
+                    console_print(f"已发送 {sent_frame_counter} 个音频帧，数据大小: {len(data)} 字节，"
+                                  f"音量: RMS={rms:.1f}, 峰值={levels['peak']}, {levels['dbfs']:.1f} dBFS, 削波={levels['clipped_total']}")
+                    if rms > 1000:
+                        console_print(f"  🔊 检测到音频信号！")
+                    else:
+                        console_print(f"  🔇 音频信号很微弱或为静音")
+                    if voice_gate is not None:
+                        console_print(f"  VAD: {'语音' if voice_gate.active else '静音'}，已节省 {voice_gate.saved_seconds:.1f}s 音频")
+                
+                # 经过VAD门后只发送语音帧（开门时包含pre-roll）
+                frames = voice_gate.process(data, levels['dbfs']) if voice_gate is not None else [data]
+                self._send(frames)
+                
+                # 接近会话时长上限时提前预热备用会话，并在句子边界（或静音时）切换过去
+                if self.max_session_seconds > 0:
+                    session_age = time.monotonic() - translator._session_started
+                    if session_age >= self.max_session_seconds - self.warmup_lead_seconds:
+                        self.standby.prepare()
+                    at_boundary = translator._session_callback.at_sentence_boundary or (
+                        voice_gate is not None and not voice_gate.active)
+                    if (session_age >= self.max_session_seconds or
+                            (session_age >= self.max_session_seconds - self.boundary_window_seconds and at_boundary)):
+                        self.translator = rotate_translator(translator, self.standby)
+                
+                # 长时间静音时干净地关闭会话，避免空闲连接一直占用
+                if self.idle_suspend_seconds > 0 and voice_gate.silence_seconds >= self.idle_suspend_seconds:
+                    console_print(f"已连续静音 {voice_gate.silence_seconds:.0f}s，挂起translator会话")
+                    session_manager.transition(SessionManager.DRAINING, '连续静音')
+                    self.standby.release()
+                    self.translator.stop()
+                    session_manager.transition(SessionManager.IDLE, '会话已挂起')
+            else:
+                console_print(f"警告: 音频数据太短 ({len(data)} 字节)")
+        except Exception as e:
+            console_print(f"发送音频数据错误: {e}")
+            if "has stopped" in str(e):
+                console_print("检测到translator已停止")
+                session_manager.session_lost('发送音频失败')
+                # 未发送成功的帧进入回放缓冲，重连后补发
+                if session_manager.outage:
+                    self.replay_buffer.begin_outage()
+                    for frame in frames:
+                        self.replay_buffer.record_outage(frame)
+
+    def close(self):
+        """关闭当前会话和备用会话"""
+        if self.saved_mic_audio_file is not None:
+            self.saved_mic_audio_file.close()
+        self.standby.close()
+        if self.voice_gate is not None:
+            console_print(f"VAD共节省 {self.voice_gate.saved_seconds:.1f}s 音频未发送")
+        
+        # 安全地停止translator
+        if session_manager.session_alive:
+            session_manager.transition(SessionManager.DRAINING, '音频处理结束')
             try:
-                stop_ffmpeg_audio_capture()
+                console_print('translator stop')
+                self.translator.stop()
             except Exception as e:
-                console_print(f"停止FFmpeg时出错: {e}")
+                console_print(f"停止translator时出错: {e}")
+        else:
+            console_print('translator已经停止，跳过stop调用')
+        session_manager.transition(SessionManager.IDLE, '音频处理结束')
+
+def gummyAsrTask():
+    if not prepare_asr_input():
+        return
+    
+    sender = AsrAudioSender()
+    try:
+        if not sender.start():
+            return
+        
+        while True:
+            state = session_manager.state
+            
+            if state == SessionManager.PAUSED:
+                # 暂停时不读取音频，等待恢复；每5秒清理一次积压的旧数据
+                sender.trim_paused_backlog()
+                session_manager.wait_while(SessionManager.PAUSED, timeout=5.0)
+                continue
+            
+            if state == SessionManager.RESTARTING:
+                delay = sender.restart()
+                if delay:
+                    # 等待重试期间继续采集音频；暂停等状态变化会立即打断等待
+                    try:
+                        sender.wait_for_retry(delay, read_audio_input)
+                    except Exception as e:
+                        console_print(f"音频读取错误: {e}")
+                        break
+                continue
             
-            if audio_stream is None:
-                console_print('audio_stream is None')
-                return
-                
             try:
-                if audio_stream is not None:
-                    audio_stream.stop_stream()
-                    audio_stream.close()
-                    audio_stream = None
-                if mic is not None:
-                    mic.terminate()
-                    mic = None
+                data = read_audio_input()
             except Exception as e:
-                console_print(f"清理音频资源时出错: {e}")
-
-        def on_event(
-            self,
-            request_id,
-            transcription_result: TranscriptionResult,
-            translation_result: TranslationResult,
-            usage,
-        ) -> None:
-            # 添加调试信息：显示收到的事件
-            event_counter = getattr(self, '_event_counter', 0)
-            event_counter += 1
-            setattr(self, '_event_counter', event_counter)
+                console_print(f"音频读取错误: {e}")
+                break
+            if data:
+                sender.process(data)
+            else:
+                sender.keepalive()
+    except Exception as e:
+        console_print(f"音频处理循环出错: {e}")
+    finally:
+        sender.close()
+        close_audio_input()
+
+
+# Handle the TTS task. This function will get text in asr_fixed_words in while loop and send it to TTS.
+# The streaming output of TTS will be played back by the player.
+TTS_URL = "https://api.siliconflow.cn/v1/audio/speech"  # SiliconFlow CosyVoice API
+TTS_SAMPLE_RATE = 24000  # TTS返回的PCM采样率（16位单声道）
+TTS_SPEED = 1.4  # TTS语速
+
+class TtsPlayer:
+    """常驻的TTS播放器
+
+    整个程序只打开一个PyAudio输出流，以回调模式从抖动缓冲区取数据播放，没有
+    数据时输出静音，句子之间不再重复打开/关闭设备。抖动缓冲区是预分配的
+    PCMRingBuffer：网络返回的块直接拷入环形存储，回调按帧长拷出，不会拼接或
+    切片剩余数据；块边界上拆开的半个采样点留到下一块补齐，保证始终按采样点对齐。
+    每句（以及断音后）先攒够prebuffer_ms再开始输出，句子中途缓冲区被取空时计为
+    一次断音。另外记录每句从发出请求到第一个样本交给设备的延迟。
+    """
+    
+    SAMPLE_WIDTH = 2
+    
+    def __init__(self, sample_rate=TTS_SAMPLE_RATE, output_device=None, frames_per_buffer=1024,
+                 buffer_seconds=10.0, prebuffer_ms=200):
+        self.sample_rate = sample_rate
+        self.output_device = output_device
+        self.frames_per_buffer = frames_per_buffer
+        self._ring = PCMRingBuffer(buffer_seconds, sample_rate, self.SAMPLE_WIDTH, overflow_policy='block')
+        self._prebuffer_bytes = int(sample_rate * prebuffer_ms / 1000) * self.SAMPLE_WIDTH
+        self._odd_byte = None  # 上一块末尾拆开的半个采样点
+        self._sentence_open = False  # 当前句还在接收数据
+        self._buffering = True  # 正在预缓冲，暂时输出静音
+        self._rebuffering = False  # 断音后的预缓冲（计入断音时长）
+        self._marks = collections.deque()  # 各句第一个样本的位置: (字节位置, 文本, 请求时间)
+        self._written = 0  # 写入的字节数（只由生产者修改）
+        self._played = 0  # 已交给设备的字节数（只由回调修改）
+        self._started = collections.deque()  # 回调播放到的句子: (文本, 首个样本延迟)
+        self._out = bytearray(frames_per_buffer * self.SAMPLE_WIDTH)  # 回调复用的输出缓冲区
+        self._silence = bytes(len(self._out))
+        self.underruns = 0  # 句子中途缓冲区被取空的次数
+        self.underrun_bytes = 0  # 断音期间补的静音字节数
+        self._reported_underruns = 0
+        self._pyaudio = None
+        self._stream = None
+        self._lock = threading.Lock()  # 只保护输出流的打开和关闭
+    
+    def start(self):
+        """打开输出流（已经打开时直接返回）"""
+        with self._lock:
+            if self._stream is not None:
+                return
+            self._pyaudio = pyaudio.PyAudio()
+            try:
+                self._stream = self._pyaudio.open(
+                    format=pyaudio.paInt16,
+                    channels=1,
+                    rate=self.sample_rate,
+                    output=True,
+                    output_device_index=self.output_device,
+                    frames_per_buffer=self.frames_per_buffer,
+                    stream_callback=self._callback
+                )
+            except Exception:
+                self._pyaudio.terminate()
+                self._pyaudio = None
+                raise
+            console_print(f"TTS播放器已启动（设备: {self.output_device if self.output_device is not None else '默认'}，"
+                          f"缓冲 {self.frames_per_buffer} 帧）")
+    
+    def begin_sentence(self, text, requested_at):
+        """开始写入一句，回调播放到这一句的第一个样本时记录延迟"""
+        self._marks.append((self._written, text, requested_at))
+        self._sentence_open = True
+    
+    def write(self, data):
+        """把PCM数据拷入抖动缓冲区，缓冲区满时等待"""
+        view = memoryview(data).cast('B')
+        if not view:
+            return
+        if self._odd_byte is not None:
+            # 补齐上一块末尾的半个采样点
+            self._written += self._ring.write(self._odd_byte + bytes(view[:1]))
+            self._odd_byte = None
+            view = view[1:]
+        aligned = len(view) - len(view) % self.SAMPLE_WIDTH
+        if aligned:
+            self._written += self._ring.write(view[:aligned])
+        if aligned < len(view):
+            self._odd_byte = bytes(view[aligned:])
+    
+    def end_sentence(self):
+        """一句写完：丢弃不成对的半个采样点，剩余数据不足预缓冲量时也开始播放"""
+        self._odd_byte = None
+        self._sentence_open = False
+    
+    def written_bytes(self):
+        return self._written
+    
+    def played_bytes(self):
+        return self._played
+    
+    def report(self):
+        """输出回调记录的首个样本延迟和断音统计（在生产者线程中调用，避免在音频回调里打印）"""
+        while self._started:
+            text, latency = self._started.popleft()
+            console_print(f"TTS首个样本延迟 {latency * 1000:.0f} ms: {text[:20]}")
+        if self.underruns != self._reported_underruns:
+            self._reported_underruns = self.underruns
+            seconds = self.underrun_bytes / (self.sample_rate * self.SAMPLE_WIDTH)
+            console_print(f"TTS播放断音 {self.underruns} 次，共补静音 {seconds:.2f} 秒")
+    
+    def _callback(self, in_data, frame_count, time_info, status):
+        needed = frame_count * self.SAMPLE_WIDTH
+        if len(self._out) != needed:
+            self._out = bytearray(needed)
+            self._silence = bytes(needed)
+        out = memoryview(self._out)
+        
+        if self._buffering:
+            # 攒够预缓冲量，或者这一句已经全部写入，才开始输出
+            depth = self._ring.depth_bytes
+            if depth >= self._prebuffer_bytes or (depth and not self._sentence_open):
+                self._buffering = False
+                self._rebuffering = False
+        filled = 0 if self._buffering else self._ring.readinto_available(out)
+        
+        if filled < needed:
+            out[filled:] = self._silence[:needed - filled]
+            if self._sentence_open:
+                if not self._buffering:
+                    # 句子还没收完缓冲区就空了：断音，重新预缓冲
+                    self.underruns += 1
+                    self._buffering = True
+                    self._rebuffering = True
+                if self._rebuffering:
+                    self.underrun_bytes += needed - filled
+            elif filled == 0:
+                self._buffering = True  # 空闲，下一句重新预缓冲
+        
+        if filled:
+            while self._marks and self._marks[0][0] < self._played + filled:
+                _, text, requested_at = self._marks.popleft()
+                self._started.append((text, time.monotonic() - requested_at))
+            self._played += filled
+        return (bytes(out), pyaudio.paContinue)
+    
+    def close(self):
+        with self._lock:
+            self._ring.close()
+            if self._stream is not None:
+                self._stream.stop_stream()
+                self._stream.close()
+                self._stream = None
+            if self._pyaudio is not None:
+                self._pyaudio.terminate()
+                self._pyaudio = None
+
+# 全局TTS播放器，第一次合成时创建
+tts_player = None
+
+def get_tts_player():
+    """取常驻的TTS播放器，第一次调用时按配置打开输出流"""
+    global tts_player
+    if tts_player is None:
+        player_config = config.get('tts_player', DEFAULT_CONFIG['tts_player'])
+        player = TtsPlayer(output_device=player_config.get('output_device'),
+                           frames_per_buffer=player_config.get('frames_per_buffer', 1024),
+                           buffer_seconds=player_config.get('buffer_seconds', 10.0),
+                           prebuffer_ms=player_config.get('prebuffer_ms', 200))
+        player.start()
+        tts_player = player
+    return tts_player
+
+def get_tts_headers():
+    """TTS请求头（API key优先读取环境变量）"""
+    api_key = config.get('siliconflow_api_key', '<your-SiliconFlow-api-key>')
+    if 'SILICONFLOW_API_KEY' in os.environ:
+        api_key = os.environ['SILICONFLOW_API_KEY']
+    
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+class TtsClient:
+    """SiliconFlow TTS的HTTP客户端
+
+    所有请求共用一个requests.Session，连接池保持keep-alive，后续句子不再重复
+    TCP/TLS握手。启用TTS时可以先发一个HEAD请求预热连接。每个请求记录从发出
+    到收到第一块音频的延迟。
+    """
+    
+    def __init__(self, url=TTS_URL, connect_timeout=5, read_timeout=30, pool_size=4):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=1)
+        self.session.mount('https://', adapter)
+        self.requests = 0
+        self.first_audio_total = 0.0
+    
+    def warm_up(self):
+        """在后台线程中预先建立到TTS服务的连接"""
+        def run():
+            started = time.monotonic()
+            try:
+                self.session.head(self.url, headers=get_tts_headers(), timeout=self.timeout)
+                console_print(f"TTS连接已预热（{(time.monotonic() - started) * 1000:.0f} ms）")
+            except requests.exceptions.RequestException as e:
+                console_print(f"TTS连接预热失败: {e}")
+        threading.Thread(target=run, daemon=True).start()
+    
+    def stream(self, text, voice):
+        """请求合成一句文本，逐块返回PCM数据；请求失败时记录日志并不返回任何数据"""
+        payload = {
+            "model": "FunAudioLLM/CosyVoice2-0.5B",
+            "input": text,
+            "voice": voice,
+            "response_format": "pcm",
+            "sample_rate": TTS_SAMPLE_RATE,
+            "stream": True,
+            "speed": TTS_SPEED,
+            "gain": 0
+        }
+        requested_at = time.monotonic()
+        with self.session.post(self.url, json=payload, headers=get_tts_headers(),
+                               stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                console_print(f"请求失败，状态码：{response.status_code}")
+                return
+            first = True
+            for chunk in response.iter_content(chunk_size=1024):
+                if not chunk:
+                    continue
+                if first:
+                    first = False
+                    latency = time.monotonic() - requested_at
+                    self.requests += 1
+                    self.first_audio_total += latency
+                    console_print(f"TTS首包延迟 {latency * 1000:.0f} ms"
+                                  f"（平均 {self.first_audio_total / self.requests * 1000:.0f} ms）")
+                yield chunk
+
+# 全局TTS客户端，第一次使用时创建
+tts_client = None
+
+def get_tts_client():
+    """取共用连接池的TTS客户端"""
+    global tts_client
+    if tts_client is None:
+        client_config = config.get('tts_client', DEFAULT_CONFIG['tts_client'])
+        tts_client = TtsClient(connect_timeout=client_config.get('connect_timeout', 5),
+                               read_timeout=client_config.get('read_timeout', 30),
+                               pool_size=client_config.get('pool_size', 4))
+    return tts_client
+
+def warm_up_tts():
+    """按配置预热TTS连接（启动或启用TTS时调用）"""
+    if config.get('tts_client', DEFAULT_CONFIG['tts_client']).get('warm_up', True):
+        get_tts_client().warm_up()
+
+class TtsCache:
+    """两级TTS音频缓存
+
+    键为规范化后的文本、音色、语速和采样率。第一级是按字节数限额的内存LRU，
+    第二级是磁盘目录下的PCM文件，总大小超出限额时删除最久未使用的文件。
+    会议中重复的问候语、人名和固定说法命中缓存后不再请求网络，直接播放。
+    """
+    
+    def __init__(self, memory_bytes, disk_dir=None, disk_bytes=0):
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+        self._memory = collections.OrderedDict()  # 键 -> PCM
+        self._memory_size = 0
+        self._disk = collections.OrderedDict()  # 键 -> 文件大小，按最近使用排序
+        self._disk_size = 0
+        self._writing = set()  # 正在写入磁盘的键，避免多个线程重复写入同一句
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            self._load_disk_index()
+    
+    @staticmethod
+    def make_key(text, voice, speed=TTS_SPEED, sample_rate=TTS_SAMPLE_RATE):
+        """规范化文本（去掉首尾空白、合并连续空白、忽略大小写）后计算缓存键"""
+        normalized = ' '.join(text.split()).casefold()
+        return hashlib.sha1(f"{normalized}|{voice}|{speed}|{sample_rate}".encode('utf-8')).hexdigest()
+    
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key + '.pcm')
+    
+    def _load_disk_index(self):
+        """按修改时间从旧到新建立磁盘缓存索引"""
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            entries = []
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.pcm'):
+                    stat = os.stat(os.path.join(self.disk_dir, name))
+                    entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        except OSError as e:
+            console_print(f"TTS磁盘缓存不可用: {e}")
+            self.disk_dir = None
+            return
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+        self._evict_disk()
+    
+    def get(self, key):
+        """取缓存的PCM，未命中返回None"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+            on_disk = key in self._disk
+        
+        if on_disk:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    data = f.read()
+                os.utime(self._path(key))
+            except OSError:
+                data = None
+            with self._lock:
+                if data:
+                    self._disk.move_to_end(key)
+                    self._put_memory(key, data)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return data
+                self._disk_size -= self._disk.pop(key, 0)
+        
+        with self._lock:
+            self.misses += 1
+        return None
+    
+    def put(self, key, data):
+        """缓存一句完整的合成结果"""
+        data = bytes(data)
+        with self._lock:
+            self._put_memory(key, data)
+            if (not self.disk_dir or key in self._disk or key in self._writing
+                    or len(data) > self.disk_bytes):
+                return
+            self._writing.add(key)  # 在锁内占位，其他线程不再写同一个键
+        try:
+            # 先写临时文件再改名，避免读到写了一半的文件；临时文件名按线程区分
+            tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            console_print(f"写入TTS磁盘缓存失败: {e}")
+            with self._lock:
+                self._writing.discard(key)
+            return
+        with self._lock:
+            self._writing.discard(key)
+            if key not in self._disk:
+                self._disk[key] = len(data)
+                self._disk_size += len(data)
+            self._evict_disk()
+    
+    def _put_memory(self, key, data):
+        """调用方需持有锁"""
+        if len(data) > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_size -= len(old)
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+    
+    def _evict_disk(self):
+        """删除最久未使用的文件直到不超过限额，调用方需持有锁"""
+        while self._disk_size > self.disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+    
+    def stats(self):
+        """返回命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'memory_bytes': self._memory_size,
+                'disk_bytes': self._disk_size,
+            }
+
+# 全局TTS缓存，第一次合成时创建（未启用时为None）
+tts_cache = None
+
+def get_tts_cache():
+    """取TTS缓存，配置中关闭缓存时返回None"""
+    global tts_cache
+    cache_config = config.get('tts_cache', DEFAULT_CONFIG['tts_cache'])
+    if not cache_config.get('enabled', True):
+        return None
+    if tts_cache is None:
+        tts_cache = TtsCache(memory_bytes=int(cache_config.get('memory_mb', 32) * 1024 * 1024),
+                             disk_dir=cache_config.get('disk_dir', 'tts_cache'),
+                             disk_bytes=int(cache_config.get('disk_mb', 256) * 1024 * 1024))
+    return tts_cache
+
+def append_tts_word(buffer, word, is_sentence_end):
+    """把新固定的文本加入待合成文本，返回(新的缓冲文本, 需要合成的句子或None)
+
+    一次加入的文本可能包含多个词，在新加入的部分中找最后一个分句标点，
+    标点前的文本超过15个字时在标点处断句，标点后的部分留在缓冲中。
+    """
+    if is_sentence_end:
+        word += '[breath][breath][breath]'
+        return '', buffer + word
+    text = buffer + word
+    cut = max(text.rfind(mark, len(buffer)) for mark in ('、', '，', '。'))
+    if cut > 15:
+        return text[cut + 1:], text[:cut + 1] + '[breath][breath][breath]'
+    return text, None
+
+class TtsPipeline:
+    """流水线TTS：后面的句子在当前句播放时提前合成
+
+    submit()把句子交给合成线程池，线程池把流式返回的PCM块放进每句自己的队列；
+    播放线程严格按提交顺序取各句的数据写入播放器，上一句写完立即接着写下一句，
+    句子之间没有请求等待。已提交但尚未播放完的句子数不超过prefetch_sentences + 1，
+    超过时submit()阻塞，避免合成远远跑在说话人前面。
+    """
+    
+    def __init__(self, workers=2, prefetch_sentences=2):
+        self.executor = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix='tts-synth')
+        self._slots = threading.Semaphore(prefetch_sentences + 1)
+        self._jobs = queue.Queue()  # 按提交顺序等待播放的句子
+        self._playing = collections.deque()  # 已写入播放器、等待播放完的句子的结束位置
+        self.thread = threading.Thread(target=self._play_loop, daemon=True)
+        self.thread.start()
+    
+    def submit(self, text, voice):
+        """提交一句待合成的文本，提前合成的句子已满时阻塞"""
+        console_print('send sentence: ', text)
+        self._slots.acquire()
+        job = {'text': text, 'chunks': queue.Queue(), 'requested_at': None}
+        self.executor.submit(self._synthesize, job, voice)
+        self._jobs.put(job)
+    
+    def _synthesize(self, job, voice):
+        """合成线程：把流式返回的PCM块放进该句的队列，结束时放入None；缓存命中时一次放入整句"""
+        job['requested_at'] = time.monotonic()
+        try:
+            cache = get_tts_cache()
+            key = TtsCache.make_key(job['text'], voice) if cache is not None else None
+            data = cache.get(key) if cache is not None else None
+            if data is not None:
+                job['chunks'].put(data)
+                self._report_cache(cache, hit=True)
+                return
             
-            if event_counter % 10 == 0 or event_counter <= 5:
-                console_print(f"收到第 {event_counter} 个ASR事件, request_id: {request_id}")
-                if transcription_result:
-                    console_print(f"  转录结果: 有 {len(transcription_result.words)} 个词")
-                if translation_result:
-                    console_print(f"  翻译结果: 存在")
+            audio = bytearray()
+            for chunk in get_tts_client().stream(job['text'], voice):
+                job['chunks'].put(chunk)
+                audio += chunk
+            # 只缓存完整收到的结果
+            if cache is not None and audio:
+                cache.put(key, audio)
+                self._report_cache(cache, hit=False)
+        except requests.exceptions.RequestException as e:
+            console_print(f"请求异常: {e}")
+        except Exception as e :
+            console_print(f"其他异常：{e}")
+        finally:
+            job['chunks'].put(None)
+    
+    def _report_cache(self, cache, hit):
+        """缓存命中时和每20次查询输出一次命中率"""
+        stats = cache.stats()
+        if hit or (stats['hits'] + stats['misses']) % 20 == 0:
+            console_print(f"TTS缓存{'命中' if hit else '未命中'}，命中率 {stats['hit_rate'] * 100:.0f}%"
+                          f"（{stats['hits']}/{stats['hits'] + stats['misses']}，磁盘命中 {stats['disk_hits']}）")
+    
+    def _release_played(self, player):
+        """释放已经播放完的句子占用的名额"""
+        while self._playing and player.played_bytes() >= self._playing[0]:
+            self._playing.popleft()
+            self._slots.release()
+    
+    def _next(self, source, player):
+        """从队列取下一项，等待期间释放播放完的名额"""
+        while True:
+            try:
+                return source.get(timeout=0.05)
+            except queue.Empty:
+                self._release_played(player)
+                player.report()
+    
+    def _play_loop(self):
+        player = None
+        while True:
+            # 等待下一句期间也要释放播放完的名额，否则submit()可能一直阻塞
+            job = self._jobs.get() if player is None else self._next(self._jobs, player)
+            try:
+                if player is None:
+                    player = get_tts_player()
+            except Exception as e:
+                console_print(f"TTS播放器启动失败: {e}")
+                self._slots.release()
+                continue
             
-            new_chinese_words = ''
-            new_target_language_words = ''
-            is_sentence_end = False
-
-            # Process transcription results. Only new fixed words will be pushed back.
-            if transcription_result != None:
-                for i, word in enumerate(transcription_result.words):
-                    if word.fixed:
-                        if i >= self.zh_word_ptr:
-                            console_print(f'新的固定中文词: {word.text}')
-                            new_chinese_words += word.text
-                            self.zh_word_ptr += 1
-
-            # Process translation results. Only new fixed words will be pushed back.
-            if translation_result != None:
-                target_language_translation = translation_result.get_translation(
-                    'zh')
-                if target_language_translation != None:
-                    for i, word in enumerate(
-                            target_language_translation.words):
-                        if word.fixed:
-                            if i >= self.tg_word_ptr:
-                                console_print(f'新的固定翻译词: {word.text}')
-                                asr_fixed_words.put([word.text, False])
-                                new_target_language_words += word.text
-                                self.tg_word_ptr += 1
-                    # Check if the current sentence has ended
-                    if target_language_translation.is_sentence_end:
-                        console_print('target_language sentence end')
-                        self.sentence_ptr += 1
-                        self.tg_word_ptr = 0
-                        self.zh_word_ptr = 0
-                        asr_fixed_words.put(['', True])
-                        is_sentence_end = True
-            wx_text_queue.put([transcription_result, translation_result])
+            first = True
+            while True:
+                chunk = self._next(job['chunks'], player)
+                if chunk is None:
+                    break
+                if first:
+                    first = False
+                    player.begin_sentence(job['text'], job['requested_at'])
+                player.write(chunk)  # 直接拷入播放器的抖动缓冲区
+            # 不等播放完就继续写下一句
+            if not first:
+                player.end_sentence()
+            self._playing.append(player.written_bytes())
+            self._release_played(player)
+
+# 全局TTS流水线，第一次合成时创建
+tts_pipeline = None
+
+def get_tts_pipeline():
+    """取TTS流水线（合成线程池和播放线程）"""
+    global tts_pipeline
+    if tts_pipeline is None:
+        pipeline_config = config.get('tts_pipeline', DEFAULT_CONFIG['tts_pipeline'])
+        tts_pipeline = TtsPipeline(workers=pipeline_config.get('workers', 2),
+                                   prefetch_sentences=pipeline_config.get('prefetch_sentences', 2))
+    return tts_pipeline
+
+def cosyvoiceTtsTask():
+    buffers = {}  # 目标语言 -> 待合成文本
+    result_subscriptions.subscribe('tts', [get_tts_language()])
+
+    # Continuously check for new words to synthesize
+    while True:
+        if not asr_fixed_words.empty():
+            word, is_sentence_end, language = asr_fixed_words.get()
+            if not enable_tts:
+                # 与asyncio运行时一致：TTS关闭期间丢弃收到的词，重新开启时不会朗读积压的旧内容
+                buffers.clear()
+                continue
+            buffers[language], sentence = append_tts_word(buffers.get(language, ''), word, is_sentence_end)
+            if sentence is not None:
+                get_tts_pipeline().submit(sentence, get_tts_voice(language))
+        else:
+            # Sleep briefly if no words are available
+            time.sleep(0.01)
+
+class AsyncQueueBridge:
+    """把其他线程（SDK回调）中的put转发到事件循环里的有界asyncio.Queue，满时丢弃最旧的项"""
+
+    def __init__(self, loop, maxsize):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def put(self, item):
+        self.loop.call_soon_threadsafe(self._put, item)
 
-    callback = Callback()
+    def _put(self, item):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(item)
 
-    # 检查API状态
-    check_api_status()
-    
-    # Set up the ASR translator
-    asr_model = config.get('asr_model', 'gummy-realtime-v1')
-    console_print(f"使用ASR模型: {asr_model}")
-    
-    # 如果API调用被禁用，给出警告
-    if not enable_api_calls:
-        console_print("⚠️  警告: API调用已禁用，translator将不会工作。请在设置中启用API调用。")
-        return  # 直接返回，不启动translator
-    
-    translator = TranslationRecognizerRealtime(
-        model=asr_model,
-        format='pcm',
-        sample_rate=16000,
-        transcription_enabled=True,
-        translation_enabled=True,
-        translation_target_languages=[target_language],
-        semantic_punctuation_enabled=False,
-        callback=callback,
-    )
+class AsyncPipeline:
+    """asyncio运行时
 
-    console_print('translator start')
-    translator.start()
-    console_print('translator request_id: {}'.format(translator.get_last_request_id()))
+    VAD/发送和TTS作为协程运行在同一个事件循环中；采集在一个守护线程中阻塞读取
+    （没有数据时一直等待，会话状态变化时被唤醒，不按短超时轮询），通过有界
+    asyncio.Queue交给发送协程：发送跟不上时采集线程等待（反压到系统音频环形缓冲区）。
+    识别结果仍由SDK回调线程直接投递到字幕邮箱，给TTS的固定词经AsyncQueueBridge
+    转入事件循环（作为tts_sink显式交给会话回调）。每帧音频只在会话执行器中处理一次
+    （保活也在其中），提交TTS句子（提前合成已满时等待）放在默认执行器中。
+    """
 
-    # Open a file to save microphone audio data
-    saved_mic_audio_file = open('mic_audio.pcm', 'wb')
+    def __init__(self, audio_queue_frames=50, tts_queue_words=200):
+        self.audio_queue_frames = audio_queue_frames
+        self.tts_queue_words = tts_queue_words
+        self.thread = None
+        self.stopping = False  # 流水线正在结束，采集线程和发送协程退出循环
 
-    try:
-        # Continuously read audio data from the microphone or FFmpeg
-        pause_cleanup_counter = 0  # 暂停时的清理计数器
+    def start(self):
+        """在后台线程中运行事件循环（wx主循环仍占用主线程）"""
+        self.thread = threading.Thread(target=asyncio.run, args=(self._main(),), daemon=True)
+        self.thread.start()
+
+    async def _main(self):
+        loop = asyncio.get_running_loop()
+        self.session_executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='asr-session')
         
-        while True:  # 主循环，用于处理translator重启
-            data = None
-            
-            # 检查是否需要重启translator
-            if need_restart_translator and not listening_paused:
-                console_print("检测到需要重启translator...")
-                translator = restart_translator(translator)
-                if translator is None:
-                    console_print("重启translator失败，退出")
-                    break
-                continue
-            
-            # 检查是否暂停监听
-            if listening_paused:
-                # 暂停时定期清理队列中的旧数据，避免积压过多
-                pause_cleanup_counter += 1
-                if pause_cleanup_counter >= 50:  # 每5秒清理一次队列 (50 * 0.1秒)
-                    if audio_source == 'system':
-                        queue_size = system_audio_queue.qsize()
-                        if queue_size > 50:  # 如果队列中有超过50个数据块（约5秒的数据）
-                            # 保留最新的20个数据块，丢弃其余的
-                            discarded_count = 0
-                            while system_audio_queue.qsize() > 20:
-                                try:
-                                    system_audio_queue.get_nowait()
-                                    discarded_count += 1
-                                except queue.Empty:
-                                    break
-                            if discarded_count > 0:
-                                console_print(f"暂停期间清理了 {discarded_count} 个音频数据块，当前队列大小: {system_audio_queue.qsize()}")
-                    pause_cleanup_counter = 0
-                
-                time.sleep(0.1)  # 暂停时短暂休息
-                continue
-            
-            # 如果translator已停止且不在暂停状态，退出循环等待重启
-            if translator_stopped and not listening_paused:
-                console_print("translator已停止，等待重启...")
-                time.sleep(0.1)
-                continue
-            
-            if audio_source == 'system' and ffmpeg_process is not None:
-                # 从FFmpeg队列读取音频数据
-                try:
-                    data = system_audio_queue.get(timeout=0.1)
-                except queue.Empty:
+        if not await loop.run_in_executor(self.session_executor, prepare_asr_input):
+            return
+        
+        # AsrCallback在SDK线程中发布固定词，经桥接进入TTS协程的有界队列
+        tts_words = AsyncQueueBridge(loop, self.tts_queue_words)
+        audio_queue = asyncio.Queue(self.audio_queue_frames)
+        sender = AsrAudioSender(tts_sink=tts_words)
+        try:
+            if not await loop.run_in_executor(self.session_executor, sender.start):
+                return
+            console_print("asyncio流水线已启动")
+            capture_done = loop.create_future()
+            self.stopping = False
+            threading.Thread(target=self._capture, args=(loop, audio_queue, capture_done),
+                             name='capture', daemon=True).start()
+            tasks = [
+                capture_done,
+                asyncio.create_task(self._send(sender, audio_queue)),
+                asyncio.create_task(self._tts(tts_words)),
+            ]
+            # 任一协程结束（如音频输入失效）时停止整个流水线
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            self.stopping = True  # wait_for可能吞掉取消，发送协程同时检查该标志
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)  # 等取消完成再关闭执行器
+            for task in done:
+                if task.exception() is not None:
+                    console_print(f"asyncio流水线出错: {task.exception()}")
+        finally:
+            self.stopping = True
+            system_audio_buffer.wake()
+            await loop.run_in_executor(self.session_executor, sender.close)
+            await loop.run_in_executor(self.session_executor, close_audio_input)
+            self.session_executor.shutdown(wait=False)
+
+    async def _wait_while(self, state, timeout):
+        """在默认执行器中等待会话离开指定状态，不占用采集和会话执行器"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, session_manager.wait_while, state, timeout)
+
+    def _capture(self, loop, audio_queue, done):
+        """采集线程：阻塞读取输入音频放入有界队列，队列满时等待；读取失败或流水线结束时退出"""
+        try:
+            while not self.stopping:
+                if session_manager.state == SessionManager.PAUSED:
+                    session_manager.wait_while(SessionManager.PAUSED, 5.0)
                     continue
-            elif audio_stream:
-                # 从PyAudio流读取音频数据
                 try:
-                    data = audio_stream.read(3200, exception_on_overflow=False)
+                    data = read_audio_input(timeout=None)
                 except Exception as e:
-                    console_print(f"PyAudio读取错误: {e}")
-                    break
-            else:
-                break
+                    console_print(f"音频读取错误: {e}")
+                    return
+                if data:
+                    asyncio.run_coroutine_threadsafe(audio_queue.put(data), loop).result()
+        except (RuntimeError, concurrent.futures.CancelledError):
+            return  # 事件循环已关闭或放入队列被取消
+        finally:
+            try:
+                loop.call_soon_threadsafe(lambda: done.done() or done.set_result(None))
+            except RuntimeError:
+                pass
+
+    async def _send(self, sender, audio_queue):
+        """发送协程：按会话状态处理音频（VAD、发送、轮换、挂起），会话操作在专用执行器中串行执行"""
+        loop = asyncio.get_running_loop()
+        while not self.stopping:
+            state = session_manager.state
+            if state == SessionManager.PAUSED:
+                await loop.run_in_executor(self.session_executor, sender.trim_paused_backlog)
+                await self._wait_while(SessionManager.PAUSED, 5.0)
+                continue
+            if state == SessionManager.RESTARTING:
+                delay = await loop.run_in_executor(self.session_executor, sender.restart)
+                if delay:
+                    # 等待重试期间继续消费采集队列，音频进入回放缓冲
+                    deadline = loop.time() + delay
+                    while session_manager.state == SessionManager.RESTARTING and loop.time() < deadline:
+                        try:
+                            data = await asyncio.wait_for(audio_queue.get(), timeout=min(1.0, deadline - loop.time()))
+                        except asyncio.TimeoutError:
+                            continue
+                        await loop.run_in_executor(self.session_executor, sender.process, data)
+                continue
             
-            if data and not listening_paused and not translator_stopped:  # 检查translator状态
-                try:
-                    # 添加音频音量检测
-                    import struct
-                    if len(data) >= 2:
-                        # 计算音频音量（RMS）
-                        samples = struct.unpack('<' + 'h' * (len(data) // 2), data)
-                        rms = (sum(sample * sample for sample in samples) / len(samples)) ** 0.5
-                        volume_db = 20 * (rms / 32767) if rms > 0 else -100
-                        
-                        # 添加调试信息：显示发送的音频数据大小和音量
-                        if hasattr(translator, 'send_audio_frame'):
-                            sent_frame_counter = getattr(translator, '_sent_frame_counter', 0)
-                            sent_frame_counter += 1
-                            setattr(translator, '_sent_frame_counter', sent_frame_counter)
-                            
-                            # 每100帧显示一次调试信息，但如果检测到有声音则立即显示
-                            if sent_frame_counter % 100 == 0 or (rms > 1000 and sent_frame_counter % 10 == 0):
-                                console_print(f"已发送 {sent_frame_counter} 个音频帧，数据大小: {len(data)} 字节，音量: RMS={rms:.1f}, dB={volume_db:.1f}")
-                                if rms > 1000:
-                                    console_print(f"  🔊 检测到音频信号！")
-                                else:
-                                    console_print(f"  🔇 音频信号很微弱或为静音")
-                            
-                            translator.send_audio_frame(data)
-                            saved_mic_audio_file.write(data)
-                        else:
-                            console_print("警告: translator没有send_audio_frame方法")
-                    else:
-                        console_print(f"警告: 音频数据太短 ({len(data)} 字节)")
-                except Exception as e:
-                    console_print(f"发送音频数据错误: {e}")
-                    if "has stopped" in str(e):
-                        console_print("检测到translator已停止")
-                        translator_stopped = True
-                    # 不要break，让循环继续等待重启
-    except Exception as e:
-        console_print(f"音频处理循环出错: {e}")
-    finally:
-        saved_mic_audio_file.close()
-        
-        # 安全地停止translator
-        if not translator_stopped:
+            # 每帧只交给会话执行器一次（process中顺带保活）；没有输入时才单独保活
             try:
-                console_print('translator stop')
-                translator.stop()
-                translator_stopped = True
-            except Exception as e:
-                console_print(f"停止translator时出错: {e}")
-        else:
-            console_print('translator已经停止，跳过stop调用')
+                data = await asyncio.wait_for(audio_queue.get(), timeout=1.0)
+            except asyncio.TimeoutError:
+                await loop.run_in_executor(self.session_executor, sender.keepalive)
+                continue
+            await loop.run_in_executor(self.session_executor, sender.process, data)
+
+    async def _tts(self, words):
+        """TTS协程：等待固定词（无轮询），凑成句子后在执行器中合成并播放"""
+        loop = asyncio.get_running_loop()
+        buffers = {}  # 目标语言 -> 待合成文本
+        result_subscriptions.subscribe('tts', [get_tts_language()])
+        while True:
+            word, is_sentence_end, language = await words.queue.get()
+            if not enable_tts:
+                buffers.clear()
+                continue
+            buffers[language], sentence = append_tts_word(buffers.get(language, ''), word, is_sentence_end)
+            if sentence is not None:
+                await loop.run_in_executor(None, get_tts_pipeline().submit, sentence,
+                                           get_tts_voice(language))
 
+class AudioDeviceDialog(wx.Dialog):
+    """音频设备选择对话框
 
-# Handle the TTS task. This function will get text in asr_fixed_words in while loop and send it to TTS.
-# The streaming output of TTS will be played back by the player.
-def cosyvoiceTtsTask():
-    global config
+    先显示device_registry中缓存的设备，缓存失效或尚未探测的部分在后台线程池中
+    探测，每类探测完成后立即补充到列表中，对话框打开期间UI不会被阻塞。
+    """
     
-    # Replace with SiliconFlow CosyVoice API
-    url = "https://api.siliconflow.cn/v1/audio/speech"
+    PROBE_KEYS = ('ffmpeg', 'dshow_devices', 'pyaudio_devices')
     
-    # 获取API key
-    api_key = config.get('siliconflow_api_key', '<your-SiliconFlow-api-key>')
-    if 'SILICONFLOW_API_KEY' in os.environ:
-        api_key = os.environ['SILICONFLOW_API_KEY']
+    def __init__(self, parent):
+        super().__init__(parent, title="选择音频设备", size=(520, 480),
+                         style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+        self.SetBackgroundColour(Win11Theme.COLORS['background'])
+        self.entries = []  # [(设备索引, 类型)]，与列表项一一对应
+        
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        intro = wx.StaticText(self, label="请选择要监听的音频设备:\n\n"
+                                          "🎵 FFmpeg系统音频 - 直接捕获系统输出（推荐）\n"
+                                          "🔌 虚拟音频设备 - VB-CABLE等虚拟线缆\n"
+                                          "🎤 普通输入设备 - 麦克风等")
+        Win11Theme.apply_statictext_style(intro)
+        sizer.Add(intro, 0, wx.ALL, 10)
+        
+        self.status_label = wx.StaticText(self, label="")
+        Win11Theme.apply_statictext_style(self.status_label, secondary=True)
+        sizer.Add(self.status_label, 0, wx.LEFT | wx.RIGHT, 10)
+        
+        self.device_list = wx.ListBox(self, style=wx.LB_SINGLE)
+        self.device_list.Bind(wx.EVT_LISTBOX_DCLICK, self.on_double_click)
+        sizer.Add(self.device_list, 1, wx.EXPAND | wx.ALL, 10)
+        
+        btn_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        refresh_btn = Win11Button(self, label="🔄 重新检测")
+        refresh_btn.Bind(wx.EVT_BUTTON, self.on_refresh)
+        btn_sizer.Add(refresh_btn, 0, wx.ALL, 5)
+        btn_sizer.AddStretchSpacer()
+        btn_sizer.Add(Win11Button(self, wx.ID_CANCEL, "取消"), 0, wx.ALL, 5)
+        ok_btn = Win11Button(self, wx.ID_OK, "确定", primary=True)
+        ok_btn.SetDefault()
+        btn_sizer.Add(ok_btn, 0, wx.ALL, 5)
+        sizer.Add(btn_sizer, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 5)
+        self.SetSizer(sizer)
+        
+        device_registry.add_listener(self.on_probe_done)
+        self.Bind(wx.EVT_WINDOW_DESTROY, self.on_destroy)
+        device_registry.prefetch(self.PROBE_KEYS)
+        self.populate()
+        self.Center()
     
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    def on_probe_done(self, key):
+        """某类探测完成（在探测线程中调用）"""
+        if key in self.PROBE_KEYS:
+            wx.CallAfter(self.populate)
     
-    voice = config.get('tts_voice', 'FunAudioLLM/CosyVoice2-0.5B:alex')
-    buffer = ''
-
-    # Continuously check for new words to synthesize
-    while True:
-        if not enable_tts:
-            time.sleep(0.1)
-            continue
-        if not asr_fixed_words.empty():
-            if not enable_tts:
-                time.sleep(0.1)
-                continue  # 如果 TTS 禁用，则跳过本次循环
-            word, is_sentence_end = asr_fixed_words.get()
-            if is_sentence_end  or ((word == '、' or word == '，' or word == '。' ) and len(buffer) > 15) :
-            #if is_sentence_end  or (word == '、' or word == '，' or word == '。' ) :
-
-                # when the sentence ends, wait for the previous sentence to finish synthesing and playing.
-                #player.stop()
-                #player.reset()
-                #player.start()
-                word += '[breath][breath][breath]'
-                buffer += word
-                # buffer += '[breath][breath][breath]'
-                console_print('send sentence: ', buffer)
-                payload = {
-                    "model": "FunAudioLLM/CosyVoice2-0.5B",
-                    "input": buffer,
-                    "voice": voice,
-                    "response_format": "pcm",
-                    "sample_rate": 24000,
-                    "stream": True,
-                    "speed": 1.4,
-                    "gain": 0
-                }
-
-                
-                buffer_size = 4096  # 缓冲区大小
-                try:
-                    response = requests.request("POST", url, json=payload, headers=headers, stream=True)
-                    if response.status_code == 200:
-                        p = pyaudio.PyAudio()
-                        stream = p.open(format=8, channels=1, rate=24000, output=True) #修改format参数
-                        buffer2 = b""  # 初始化缓冲区
-                        for chunk in response.iter_content(chunk_size=1024):
-                            if chunk:
-                                #console_print("len_chunk:", len(chunk))
-                                buffer2 += chunk  # 将数据块添加到缓冲区
-                                #console_print("len_buffer:",len(buffer2))
-                                while len(buffer2) >= buffer_size:  # 当缓冲区达到一定大小时
-                                    data_to_play = buffer2[:buffer_size]  # 从缓冲区中取出数据
-                                    stream.write(data_to_play)  # 播放数据
-                                    buffer2 = buffer2[buffer_size:]  # 更新缓冲区
-                        # 播放剩余的缓冲区数据
-                        if len(buffer2) > 0 :
-                            stream.write(buffer2)
-                        stream.stop_stream()
-                        stream.close()
-                        p.terminate() 
-                    else:
-                        console_print(f"请求失败，状态码：{response.status_code}")
-                    buffer = ''
-                except requests.exceptions.RequestException as e:
-                    console_print(f"请求异常: {e}")
-                except Exception as e :
-                    console_print(f"其他异常：{e}")
-            else:
-                buffer += word
-                #console_print('buffer: ', buffer)
-                    
+    def on_destroy(self, event):
+        if event.GetEventObject() is self:
+            device_registry.remove_listener(self.on_probe_done)
+        event.Skip()
+    
+    def on_refresh(self, event):
+        device_registry.refresh(self.PROBE_KEYS, background=True)
+        self.populate()
+    
+    def on_double_click(self, event):
+        if self.get_selection() is not None:
+            self.EndModal(wx.ID_OK)
+    
+    def populate(self):
+        """用当前缓存的探测结果重建设备列表，保留已选中的设备"""
+        if not self:  # 对话框已关闭
+            return
+        selected = self.get_selection()
+        ffmpeg_available = check_ffmpeg(block=False)
+        pyaudio_ready = device_registry.get('pyaudio_devices', block=False) is not None
+        dshow_ready = device_registry.get('dshow_devices', block=False) is not None
+        
+        items = []
+        items.append(("🎯 自动选择（检测正在传输音频的设备）", -2, 'auto'))  # 按信号能量自动选择
+        
+        if ffmpeg_available is None:
+            items.append(("⏳ 正在检测FFmpeg...", None, 'header'))
+        elif ffmpeg_available:
+            items.append(("=== FFmpeg系统音频捕获（推荐） ===", None, 'header'))
+            items.append(("🎵 系统音频输出（自动检测）", -1, 'ffmpeg'))  # 使用FFmpeg默认设备
+            for i, dev in enumerate(get_windows_audio_devices(block=False)):
+                items.append((f"🎵 {dev['name']} (FFmpeg)", i, 'ffmpeg'))
+            if not dshow_ready:
+                items.append(("⏳ 正在枚举FFmpeg设备...", None, 'header'))
+        
+        if pyaudio_ready:
+            virtual_devices = get_virtual_audio_devices(block=False)
+            if virtual_devices:
+                items.append(("=== 虚拟音频设备 ===", None, 'header'))
+                for dev in virtual_devices:
+                    items.append((f"🔌 {dev['name']} (索引: {dev['index']})", dev['index'], 'virtual'))
+            
+            items.append(("=== 所有输入设备 ===", None, 'header'))
+            for dev in get_system_audio_devices(block=False):
+                if dev['type'] == 'input':
+                    items.append((f"🎤 {dev['name']} (索引: {dev['index']})", dev['index'], 'regular'))
         else:
-            # Sleep briefly if no words are available
-            time.sleep(0.01)
+            items.append(("⏳ 正在枚举输入设备...", None, 'header'))
+        
+        self.entries = [(index, device_type) for _, index, device_type in items]
+        self.device_list.Set([label for label, _, _ in items])
+        if selected in self.entries:
+            self.device_list.SetSelection(self.entries.index(selected))
+        
+        probing = any(device_registry.is_pending(key) for key in self.PROBE_KEYS)
+        if probing or ffmpeg_available is None:
+            status = "⏳ 正在后台检测设备，结果会陆续显示..."
+        else:
+            status = f"FFmpeg状态: {'✅ 可用' if ffmpeg_available else '❌ 不可用'}"
+        self.status_label.SetLabel(status)
+        self.Layout()
+    
+    def get_selection(self):
+        """返回选中的(设备索引, 类型)，未选中或选中的是分组标题时返回None"""
+        selection = self.device_list.GetSelection()
+        if selection == wx.NOT_FOUND or selection >= len(self.entries):
+            return None
+        entry = self.entries[selection]
+        return None if entry[1] == 'header' else entry
 
 class SettingsDialog(wx.Dialog):
     """设置对话框 - Win11风格"""
@@ -1851,6 +4201,7 @@ class SettingsDialog(wx.Dialog):
         detect_btn = Win11Button(path_panel, label="🔍 自动检测", primary=True)
         detect_btn.Bind(wx.EVT_BUTTON, self.on_detect_ffmpeg)
         btn_sizer.Add(detect_btn, 0, wx.RIGHT, 10)
+        self.detect_btn = detect_btn
         
         # 清空按钮
         clear_btn = Win11Button(path_panel, label="🗑️ 清空")
@@ -1920,7 +4271,7 @@ class SettingsDialog(wx.Dialog):
         Win11Theme.apply_statictext_style(label)
         settings_group.Add(label, 0, wx.ALL, 8)
         
-        lang_choices = ["zh", "en", "ja", "ko", "fr", "es", "de", "ru"]
+        lang_choices = list(SUPPORTED_TARGET_LANGUAGES)
         lang_names = {"zh": "中文", "en": "English", "ja": "日本语", "ko": "한국어", 
                      "fr": "Français", "es": "Español", "de": "Deutsch", "ru": "Русский"}
         lang_display = [f"{code} ({lang_names.get(code, code)})" for code in lang_choices]
@@ -1938,6 +4289,16 @@ class SettingsDialog(wx.Dialog):
         self.target_language.Bind(wx.EVT_MOUSEWHEEL, self.on_choice_mousewheel)
         settings_group.Add(self.target_language, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 8)
         
+        # 附加目标语言（同一会话同时翻译，每种语言一个字幕面板）
+        label = wx.StaticText(audio_panel, label="附加目标语言（逗号分隔，如 en,ja）")
+        Win11Theme.apply_statictext_style(label)
+        settings_group.Add(label, 0, wx.ALL, 8)
+        
+        self.extra_target_languages = wx.TextCtrl(
+            audio_panel, value=','.join(self.config.get('extra_target_languages', [])))
+        Win11Theme.apply_textctrl_style(self.extra_target_languages)
+        settings_group.Add(self.extra_target_languages, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 8)
+        
         # 功能开关区域
         switches_panel = Win11Panel(audio_panel)
         switches_sizer = wx.BoxSizer(wx.VERTICAL)
@@ -2001,6 +4362,7 @@ TTS语音播报：
         test_btn.SetToolTip("测试当前配置是否正确")
         test_btn.Bind(wx.EVT_BUTTON, self.on_test_settings)
         btn_sizer.Add(test_btn, 0, wx.ALL, 8)
+        self.test_btn = test_btn
         
         btn_sizer.AddStretchSpacer()
         
@@ -2020,9 +4382,27 @@ TTS语音播报：
         btn_panel.SetSizer(btn_sizer)
         main_sizer.Add(btn_panel, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 15)
     
+    def parse_extra_target_languages(self):
+        """解析附加目标语言输入框（小写、去重）"""
+        languages = []
+        for code in self.extra_target_languages.GetValue().replace('，', ',').split(','):
+            code = code.strip().lower()
+            if code and code not in languages:
+                languages.append(code)
+        return languages
+    
     def on_ok(self, event):
         """处理确定按钮点击"""
         try:
+            # 附加目标语言必须是支持的语言代码
+            invalid = [code for code in self.parse_extra_target_languages()
+                       if code not in SUPPORTED_TARGET_LANGUAGES]
+            if invalid:
+                wx.MessageBox(f"不支持的附加目标语言：{', '.join(invalid)}\n\n"
+                              f"可选：{', '.join(SUPPORTED_TARGET_LANGUAGES)}",
+                              "错误", wx.OK | wx.ICON_ERROR)
+                return
+            
             # 获取配置并验证
             new_config = self.get_config()
             
@@ -2054,44 +4434,46 @@ TTS语音播报：
         dialog.Destroy()
     
     def on_detect_ffmpeg(self, event):
-        """自动检测FFmpeg"""
-        # 临时保存当前配置
-        old_ffmpeg_path = self.config.get('ffmpeg_path')
-        
-        # 清除配置中的FFmpeg路径以触发自动检测
-        self.config['ffmpeg_path'] = None
-        
-        if check_ffmpeg():
-            global ffmpeg_path
-            self.ffmpeg_path.SetValue(ffmpeg_path or '')
-            wx.MessageBox(f"检测到FFmpeg: {ffmpeg_path}", "检测成功", wx.OK | wx.ICON_INFORMATION)
+        """自动检测FFmpeg（忽略当前填写的路径，在后台线程中探测）"""
+        self.detect_btn.Disable()
+        self.detect_btn.SetLabel("⏳ 检测中...")
+        run_probe_in_background(probe_ffmpeg_path, self.on_detect_ffmpeg_done, False)
+    
+    def on_detect_ffmpeg_done(self, path, error):
+        if not self:  # 对话框已关闭
+            return
+        self.detect_btn.SetLabel("🔍 自动检测")
+        self.detect_btn.Enable()
+        # 保存设置后按新路径重新探测
+        device_registry.invalidate('ffmpeg')
+        if path:
+            self.ffmpeg_path.SetValue(path)
+            wx.MessageBox(f"检测到FFmpeg: {path}", "检测成功", wx.OK | wx.ICON_INFORMATION)
         else:
             wx.MessageBox("未检测到FFmpeg，请手动指定路径", "检测失败", wx.OK | wx.ICON_WARNING)
-        
-        # 恢复原配置
-        self.config['ffmpeg_path'] = old_ffmpeg_path
     
     def on_test_settings(self, event):
-        """测试设置"""
+        """测试设置（FFmpeg在后台线程中测试）"""
         # 获取当前设置
         test_config = self.get_config()
         
-        # 测试FFmpeg
         if test_config.get('ffmpeg_path'):
-            if os.path.exists(test_config['ffmpeg_path']):
-                try:
-                    result = subprocess.run([test_config['ffmpeg_path'], '-version'], 
-                                          capture_output=True, text=True, timeout=5)
-                    if result.returncode == 0:
-                        ffmpeg_status = "✅ FFmpeg测试成功"
-                    else:
-                        ffmpeg_status = "❌ FFmpeg无法运行"
-                except Exception as e:
-                    ffmpeg_status = f"❌ FFmpeg测试失败: {e}"
-            else:
-                ffmpeg_status = "❌ FFmpeg路径不存在"
+            self.test_btn.Disable()
+            self.test_btn.SetLabel("⏳ 测试中...")
+            run_probe_in_background(test_ffmpeg_executable,
+                                    lambda status, error: self.show_test_results(test_config, status, error),
+                                    test_config['ffmpeg_path'])
         else:
-            ffmpeg_status = "⚠️ 未设置FFmpeg路径"
+            self.show_test_results(test_config, "⚠️ 未设置FFmpeg路径", None)
+    
+    def show_test_results(self, test_config, ffmpeg_status, error):
+        """显示设置测试结果"""
+        if not self:
+            return
+        self.test_btn.SetLabel("🧪 测试配置")
+        self.test_btn.Enable()
+        if error is not None:
+            ffmpeg_status = f"❌ FFmpeg测试失败: {error}"
         
         # 测试API Key（简单验证格式）
         dashscope_key = test_config.get('dashscope_api_key', '')
@@ -2293,11 +4675,15 @@ TTS语音播报：
         
         # 获取目标语言（从显示格式中提取语言代码）
         lang_selection = self.target_language.GetSelection()
-        lang_choices = ["zh", "en", "ja", "ko", "fr", "es", "de", "ru"]
+        lang_choices = list(SUPPORTED_TARGET_LANGUAGES)
         if 0 <= lang_selection < len(lang_choices):
             config['target_language'] = lang_choices[lang_selection]
         else:
             config['target_language'] = 'zh'  # 默认中文
+        config['extra_target_languages'] = [
+            code for code in self.parse_extra_target_languages()
+            if code != config['target_language']
+        ]
             
         config['enable_tts'] = self.enable_tts.GetValue()
         config['enable_console_output'] = self.enable_console_output.GetValue()
@@ -2308,6 +4694,359 @@ TTS语音播报：
         
         return config
 
+class SubtitleHistory:
+    """有界的字幕历史
+
+    内存中用deque保留最近的句子（不超过max_sentences句和max_chars个字符），更早的
+    已结束句子追加写入磁盘上的转录文件（每行一句），需要时按句子序号读回。
+    句子序号从0开始连续编号，base为内存中第一句的序号。
+    """
+
+    def __init__(self, name, max_sentences=100, max_chars=1000, transcript_dir='transcripts'):
+        self.name = name
+        self.max_sentences = max(1, max_sentences)
+        self.max_chars = max_chars
+        self.transcript_dir = transcript_dir
+        self.lines = collections.deque([['', '']])  # [固定文本, 未固定文本]，最后一句正在识别
+        self.base = 0
+        self.chars = 0
+        self._path = None
+        self._file = None
+        self._offsets = array.array('q')  # 每个已写入磁盘的句子在文件中的偏移
+
+    @property
+    def live_index(self):
+        """正在识别的句子的序号"""
+        return self.base + len(self.lines) - 1
+
+    def text(self, index):
+        fixed, unfixed = self.lines[index - self.base]
+        return fixed + unfixed
+
+    def set(self, index, fixed, unfixed, ended=False):
+        """更新一句的内容，已写入磁盘的句子不再更新"""
+        if index < self.base:
+            return
+        while self.live_index < index:
+            self.lines.append(['', ''])
+        line = self.lines[index - self.base]
+        self.chars += len(fixed) + len(unfixed) - len(line[0]) - len(line[1])
+        line[0] = fixed
+        line[1] = unfixed
+        if ended and index == self.live_index:
+            self.lines.append(['', ''])
+        self._spill()
+
+    def _spill(self):
+        """把超出窗口的最旧句子写入转录文件"""
+        while len(self.lines) > 1 and (len(self.lines) > self.max_sentences or self.chars > self.max_chars):
+            fixed, unfixed = self.lines.popleft()
+            self.chars -= len(fixed) + len(unfixed)
+            self.base += 1
+            self._append_transcript(fixed + unfixed)
+
+    def _append_transcript(self, text):
+        try:
+            if self._file is None:
+                os.makedirs(self.transcript_dir, exist_ok=True)
+                self._path = os.path.join(
+                    self.transcript_dir, f"subtitle_{time.strftime('%Y%m%d_%H%M%S')}_{self.name}.txt")
+                self._file = open(self._path, 'ab')
+                console_print(f"字幕历史超出窗口，写入转录文件: {self._path}")
+            self._offsets.append(self._file.tell())
+            self._file.write(text.replace('\n', ' ').encode('utf-8') + b'\n')
+            self._file.flush()
+        except OSError as e:
+            console_print(f"写入转录文件失败: {e}")
+            self._offsets.append(-1)
+
+    def load_spilled(self, start, end):
+        """从转录文件读回序号在[start, end)之间的句子"""
+        start = max(0, start)
+        end = min(end, len(self._offsets))
+        if start >= end or self._path is None:
+            return []
+        texts = []
+        try:
+            with open(self._path, 'rb') as f:
+                for index in range(start, end):
+                    offset = self._offsets[index]
+                    if offset < 0:
+                        texts.append('')
+                        continue
+                    f.seek(offset)
+                    texts.append(f.readline().decode('utf-8').rstrip('\n'))
+        except OSError as e:
+            console_print(f"读取转录文件失败: {e}")
+            return []
+        return texts
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class IncrementalSubtitleRenderer:
+    """RichTextCtrl字幕的增量渲染器
+
+    已结束的句子只追加一次（常规字重），每次只删除并重写最后一行（正在识别的
+    句子，粗体）所在的文本范围，滚出历史窗口的句子从文本框顶部删除。字体和样式
+    属性缓存复用，每次更新的开销与会话长度无关。用户向上浏览历史时暂停自动滚动
+    和顶部删除。已写入的句子被修改或切换颜色模式时调用reset()整体重绘一次。
+    """
+
+    def __init__(self, text_box, font_size=14):
+        self.text_box = text_box
+        self.normal_font = wx.Font(font_size, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL)
+        self.live_font = wx.Font(font_size, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_BOLD)
+        self.attr = rt.RichTextAttr()
+        self.attr.SetAlignment(wx.TEXT_ALIGNMENT_LEFT)  #左对齐
+        self.attr.SetLineSpacing(14)  # 设置行间距
+        self.browsing = False  # 用户正在向上浏览历史
+        self.render_count = 0
+        self.render_seconds = 0.0
+        self.reset()
+
+    def reset(self):
+        """清空文本框，下次render()时整体重绘"""
+        self.text_box.Clear()
+        self.text_box.SetDefaultStyle(self.attr)
+        self.first_line = None  # 文本框中第一句的序号
+        self.committed_lines = None  # 已写入的已结束句子之后的序号
+        self.line_lengths = collections.deque()  # 文本框中每个已结束句子的字符数
+        self.live_start = 0  # 最后一行在文本框中的起始位置
+
+    def _write(self, text, font, colour):
+        if not text:
+            return
+        self.text_box.BeginFont(font)
+        self.text_box.BeginTextColour(colour)
+        self.text_box.WriteText(text)
+        self.text_box.EndTextColour()
+        self.text_box.EndFont()
+
+    def render(self, history, dark_mode):
+        """把SubtitleHistory的变化同步到文本框并立即重绘（计时包含绘制）"""
+        started = time.perf_counter()
+        text_box = self.text_box
+        colour = wx.WHITE if dark_mode else wx.BLACK
+        if self.first_line is None:
+            self.first_line = self.committed_lines = history.base
+        
+        # 删除上一次写入的最后一行
+        last_position = text_box.GetLastPosition()
+        if last_position > self.live_start:
+            text_box.Remove(self.live_start, last_position)
+        
+        # 滚出历史窗口的句子从顶部删除（浏览历史时暂缓）
+        if not self.browsing:
+            removed = 0
+            while self.first_line < history.base and self.line_lengths:
+                removed += self.line_lengths.popleft()
+                self.first_line += 1
+            if removed:
+                text_box.Remove(0, removed)
+                self.live_start -= removed
+            if not self.line_lengths:
+                self.first_line = max(self.first_line, history.base)
+        text_box.SetInsertionPointEnd()
+        
+        # 新结束的句子只追加一次（还没写入就已滚出窗口的句子跳过）
+        self.committed_lines = max(self.committed_lines, history.base)
+        if history.live_index > self.committed_lines:
+            texts = [history.text(i) for i in range(self.committed_lines, history.live_index)]
+            self._write(''.join(texts), self.normal_font, colour)
+            self.line_lengths.extend(len(text) for text in texts)
+            self.committed_lines = history.live_index
+        
+        # Write the last line with bold font
+        self.live_start = text_box.GetLastPosition()
+        self._write(history.text(history.live_index), self.live_font, colour)
+
+        # Auto-scroll to the bottom of the text boxes
+        if not self.browsing:
+            text_box.ShowPosition(text_box.GetLastPosition() - 2)
+        text_box.Update()  # 同步绘制，与画布的计时范围一致
+        
+        self.render_count += 1
+        self.render_seconds += time.perf_counter() - started
+
+    def prepend(self, texts, dark_mode):
+        """在顶部插入从转录文件读回的句子"""
+        text = ''.join(texts)
+        if not text:
+            return
+        self.text_box.SetInsertionPoint(0)
+        self._write(text, self.normal_font, wx.WHITE if dark_mode else wx.BLACK)
+        self.line_lengths.extendleft(reversed([len(t) for t in texts]))
+        self.first_line -= len(texts)
+        self.live_start += len(text)
+        self.text_box.SetInsertionPointEnd()
+
+class SubtitleCanvas(wx.Panel):
+    """双缓冲的字幕画布，可替代RichTextCtrl
+
+    用wx.GraphicsContext只绘制能显示下的最后几行：每句单独成段，正在识别的句子
+    用粗体。逐字宽度和每句的换行结果都有缓存，新内容只测量新增的字符。同时实现
+    增量渲染器的接口（render/reset），背景色跟随面板透明度设置，文字颜色跟随颜色模式。
+    向上滚动时按句浏览历史，超出内存窗口的句子从转录文件读回；滚回最后一句时恢复跟随。
+    """
+
+    LAYOUT_CACHE_SIZE = 64  # 缓存换行结果的句子数
+    MARGIN = (8, 4)
+
+    def __init__(self, parent, font_size=14):
+        super().__init__(parent, style=wx.NO_BORDER | wx.FULL_REPAINT_ON_RESIZE)
+        self.SetBackgroundStyle(wx.BG_STYLE_PAINT)
+        self.normal_font = wx.Font(font_size, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL)
+        self.live_font = wx.Font(font_size, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_BOLD)
+        self.history = None
+        self.dark_mode = False
+        self.text_colour = None  # SetDefaultStyle设置的文字颜色，None时按颜色模式
+        self.committed_lines = None  # 画布没有已写入的内容，不需要reset
+        self.browsing = False
+        self.bottom_index = None  # 浏览历史时显示在最底部的句子序号，None时跟随最新
+        self._spilled = {}  # 从转录文件读回的句子：序号 -> 文本
+        self.render_count = 0
+        self.render_seconds = 0.0
+        self._char_widths = ({}, {})  # (常规, 粗体) 字符 -> 宽度
+        self._line_height = None
+        self._layouts = collections.OrderedDict()  # (序号, 文本, 宽度, 粗体) -> 换行后的行
+        self.Bind(wx.EVT_PAINT, self.on_paint)
+
+    def render(self, history, dark_mode):
+        """记录最新的历史并立即重绘（计时包含绘制，与RichTextCtrl渲染器一致）"""
+        started = time.perf_counter()
+        self.history = history
+        self.dark_mode = dark_mode
+        self.Refresh(False)
+        self.Update()
+        self.render_count += 1
+        self.render_seconds += time.perf_counter() - started
+
+    def reset(self):
+        self._layouts.clear()
+        self.bottom_index = None
+        self.browsing = False
+        self._spilled.clear()
+        self.Refresh(False)
+
+    def SetDefaultStyle(self, attr):
+        """兼容RichTextCtrl的接口，只取文字颜色"""
+        if attr.HasTextColour():
+            self.text_colour = attr.GetTextColour()
+
+    def SetFont(self, font):
+        """字号变化时重建常规/粗体字体，清空字宽、行高和换行缓存"""
+        size = font.GetPointSize()
+        self.normal_font = wx.Font(size, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL)
+        self.live_font = wx.Font(size, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_BOLD)
+        self._char_widths = ({}, {})
+        self._line_height = None
+        self._layouts.clear()
+        self.Refresh(False)
+        return super().SetFont(font)
+
+    def scroll(self, history, sentences, load_back=20):
+        """按句浏览历史：正数向上、负数向下，滚回最后一句时恢复跟随最新"""
+        bottom = history.live_index if self.bottom_index is None else self.bottom_index
+        bottom -= sentences
+        first = min(self._spilled, default=history.base)
+        if sentences > 0 and bottom - load_back < first and first > 0:
+            start = max(0, first - load_back)
+            self._spilled.update(zip(range(start, first), history.load_spilled(start, first)))
+            first = min(self._spilled, default=history.base)
+        bottom = max(bottom, first)
+        if bottom >= history.live_index:
+            self.bottom_index = None
+            self.browsing = False
+            self._spilled.clear()
+        else:
+            self.bottom_index = bottom
+            self.browsing = True
+        self.history = history
+        self.Refresh(False)
+
+    def _text(self, history, index):
+        """取一句的文本，内存窗口之前的句子从读回的转录中取"""
+        if index >= history.base:
+            return history.text(index)
+        if index not in self._spilled:
+            # 浏览期间又有句子滚出内存窗口，补读这一段
+            self._spilled.update(zip(range(index, history.base), history.load_spilled(index, history.base)))
+        return self._spilled.get(index, '')
+
+    def _wrap(self, gc, text, width, bold):
+        """按可用宽度逐字换行，字符宽度缓存复用"""
+        widths = self._char_widths[bold]
+        lines = []
+        start = 0
+        line_width = 0.0
+        for i, char in enumerate(text):
+            char_width = widths.get(char)
+            if char_width is None:
+                char_width = widths[char] = gc.GetTextExtent(char)[0]
+            if line_width + char_width > width and i > start:
+                lines.append(text[start:i])
+                start = i
+                line_width = 0.0
+            line_width += char_width
+        lines.append(text[start:])
+        return lines
+
+    def _layout(self, gc, index, text, width, bold):
+        key = (index, text, width, bold)
+        lines = self._layouts.get(key)
+        if lines is None:
+            gc.SetFont(self.live_font if bold else self.normal_font, wx.BLACK)
+            lines = self._wrap(gc, text, width, bold)
+            self._layouts[key] = lines
+            if len(self._layouts) > self.LAYOUT_CACHE_SIZE:
+                self._layouts.popitem(last=False)
+        else:
+            self._layouts.move_to_end(key)
+        return lines
+
+    def on_paint(self, event):
+        dc = wx.AutoBufferedPaintDC(self)
+        dc.SetBackground(wx.Brush(self.GetBackgroundColour()))
+        dc.Clear()
+        history = self.history
+        if history is None:
+            return
+        gc = wx.GraphicsContext.Create(dc)
+        if gc is None:
+            return
+        
+        width, height = self.GetClientSize()
+        margin_x, margin_y = self.MARGIN
+        text_width = max(1, width - 2 * margin_x)
+        if self._line_height is None:
+            gc.SetFont(self.live_font, wx.BLACK)
+            self._line_height = gc.GetTextExtent('国')[1] + 2
+        max_lines = max(1, (height - 2 * margin_y) // self._line_height)
+        
+        # 从最底部的句子（默认为正在识别的句子）往前收集，直到填满可见区域
+        visible = []  # [(行文本, 粗体)]，倒序
+        index = history.live_index if self.bottom_index is None else self.bottom_index
+        first = min(self._spilled, default=history.base) if self.browsing else history.base
+        while index >= first and len(visible) < max_lines:
+            bold = index == history.live_index
+            lines = self._layout(gc, index, self._text(history, index), text_width, bold)
+            for line in reversed(lines):
+                visible.append((line, bold))
+            index -= 1
+        visible = visible[:max_lines]
+        
+        colour = self.text_colour or (wx.WHITE if self.dark_mode else wx.BLACK)
+        normal_font = gc.CreateFont(self.normal_font, colour)
+        live_font = gc.CreateFont(self.live_font, colour)
+        y = height - margin_y - self._line_height * len(visible)
+        for line, bold in reversed(visible):
+            gc.SetFont(live_font if bold else normal_font)
+            gc.DrawText(line, margin_x, y)
+            y += self._line_height
+
 class FloatingSubtitleWindow(wx.Frame):
     def __init__(self):
         # 初始化背景相关属性
@@ -2334,7 +5073,9 @@ class FloatingSubtitleWindow(wx.Frame):
         self.font_size = 14
         self.font_family = wx.FONTFAMILY_DEFAULT
         self.text_color = Win11Theme.COLORS['text_primary']
-        self.MAX_CHARS = 1000
+        history_config = config.get('history', {})
+        self.MAX_SENTENCES = history_config.get('max_sentences', 100)
+        self.MAX_CHARS = history_config.get('max_chars', 1000)
 
         self.SetSize((950, 120))  # 略微增大窗口以适应Win11风格
         
@@ -2376,6 +5117,7 @@ class FloatingSubtitleWindow(wx.Frame):
         
         # 创建状态栏 - Win11风格，适中高度
         self.status_bar = self.CreateStatusBar(1)
+        self.auto_selecting = False  # 正在后台按信号自动选择设备
         self.status_bar.SetFont(Win11Theme.get_font(9))  # 适中字体大小
         self.status_bar.SetForegroundColour(Win11Theme.COLORS['text_secondary'])
         self.status_bar.SetBackgroundColour(Win11Theme.COLORS['surface_variant'])
@@ -2384,18 +5126,43 @@ class FloatingSubtitleWindow(wx.Frame):
         self.update_status_bar()
         # 默认显示状态栏
         self.status_bar.Show(True)
+        # FFmpeg后台探测完成后刷新状态栏
+        device_registry.add_listener(self.on_device_registry_updated)
         
         self.panel.SetSizer(self.main_sizer)
         
         # 初始化缓冲区
         self.chinese_buffer = ''
-        self.chinese_text_buffer = [['', '']]  # 源语言文本缓冲区
-        self.target_language_text_buffer = [['', '']]  # 目标语言文本缓冲区
-
-        # 设置定时器用于更新文本
+        self.chinese_text_buffer = self.create_history('source')  # 源语言文本缓冲区
+        self.target_language_text_buffer = self.create_history(target_language)  # 目标语言文本缓冲区
+        # 附加目标语言的面板：收到该语言的第一条结果时才创建
+        self.extra_language_panels = {}  # 语言 -> {'panel', 'text_box', 'text_buffer'}
+        self.renderers = {}  # 文本框ID -> 增量渲染器
+        self.text_box_histories = {}  # 文本框ID -> 字幕历史（向上滚动时读回）
+        self.text_box_histories[self.chinese_text_box.GetId()] = self.chinese_text_buffer
+        self.text_box_histories[self.target_language_text_box.GetId()] = self.target_language_text_buffer
+        self.chinese_text_box.Bind(wx.EVT_MOUSEWHEEL, self.on_text_box_mousewheel)
+        self.target_language_text_box.Bind(wx.EVT_MOUSEWHEEL, self.on_text_box_mousewheel)
+        self.Bind(wx.EVT_CLOSE, self.on_window_close)
+        self.panel_language = target_language  # 主目标语言面板显示的语言
+        result_subscriptions.subscribe('ui', get_target_languages())
+
+        # 设置定时器用于更新文本：有更新时快速刷新，空闲、暂停时降频，最小化时停止
+        ui_timer_config = config.get('ui_timer', DEFAULT_CONFIG['ui_timer'])
+        self.fast_interval = ui_timer_config.get('fast_interval', 100)
+        self.idle_interval = ui_timer_config.get('idle_interval', 500)
+        self.paused_interval = ui_timer_config.get('paused_interval', 1000)
+        self.idle_after_ticks = ui_timer_config.get('idle_after_ticks', 20)
+        self.idle_ticks = 0  # 连续没有字幕更新的次数
+        self.tick_interval = None  # 当前定时器间隔，None表示已停止
+        self.next_status_update = 0.0
+        self.next_stats_log = time.monotonic() + 60
         self.timer = wx.Timer(self)
         self.Bind(wx.EVT_TIMER, self.on_timer, self.timer)
-        self.timer.Start(100)  # 每100毫秒更新一次
+        self.set_tick_interval(self.fast_interval)
+        self.Bind(wx.EVT_ICONIZE, self.on_iconize)
+        # 会话状态变化（暂停、静音挂起、恢复）时重新调整刷新频率
+        session_manager.add_wake_hook(lambda: wx.CallAfter(self.on_session_state_changed))
 
         # 绑定快捷键事件
         self.Bind(wx.EVT_CHAR_HOOK, self.on_key_press)
@@ -2409,10 +5176,13 @@ class FloatingSubtitleWindow(wx.Frame):
         # 设置最小窗口大小
         self.SetMinSize((300, 100))
 
-        # 创建定时器，每100毫秒检查一次鼠标位置
+        # 鼠标进入/离开时检查鼠标位置，低频定时器兜底（快速移出窗口时可能收不到离开事件）
+        for window in (self, self.panel, self.status_bar, self.chinese_text_box, self.target_language_text_box):
+            self.bind_hover_events(window)
+        self.hover_fallback_interval = ui_timer_config.get('hover_fallback_interval', 500)
         self.mouse_check_timer = wx.Timer(self)
         self.Bind(wx.EVT_TIMER, self.check_mouse_position, self.mouse_check_timer)
-        self.mouse_check_timer.Start(100)  # 100毫秒间隔
+        self.mouse_check_timer.Start(self.hover_fallback_interval)
 
         # 初始化时立即检查鼠标位置来设置正确的状态
         wx.CallAfter(self.initial_mouse_check)
@@ -2434,8 +5204,17 @@ class FloatingSubtitleWindow(wx.Frame):
             self.Refresh()
 
 
-    def check_mouse_position(self, event):
-        """定时检查鼠标位置"""
+    def bind_hover_events(self, window):
+        """鼠标进入/离开该窗口时检查是否显示标题栏"""
+        window.Bind(wx.EVT_ENTER_WINDOW, self.on_hover_event)
+        window.Bind(wx.EVT_LEAVE_WINDOW, self.on_hover_event)
+
+    def on_hover_event(self, event):
+        event.Skip()
+        self.check_mouse_position()
+
+    def check_mouse_position(self, event=None):
+        """检查鼠标位置，只在进出窗口时切换标题栏和状态栏"""
         x, y = wx.GetMousePosition()  # 获取鼠标全局坐标
         rect = self.GetScreenRect()  # 获取窗口全局坐标的矩形区域
         if not rect.Contains(wx.Point(x, y)):
@@ -2468,12 +5247,91 @@ class FloatingSubtitleWindow(wx.Frame):
     on_mouse_leave = None  # 移除鼠标离开事件处理
     hide_titlebar = None  # 移除隐藏标题栏函数
 
+    def set_tick_interval(self, interval):
+        """调整刷新定时器的间隔（None表示停止）"""
+        if interval is None:
+            if self.timer.IsRunning():
+                self.timer.Stop()
+        elif interval != self.tick_interval or not self.timer.IsRunning():
+            self.timer.Start(interval)
+        self.tick_interval = interval
+
+    def choose_tick_interval(self):
+        """按窗口和会话状态选择刷新间隔：最小化时停止，暂停或静音挂起时最慢，连续没有更新时降频"""
+        if self.IsIconized() or not self.IsShown():
+            return None
+        if session_manager.state in (SessionManager.PAUSED, SessionManager.IDLE):
+            return self.paused_interval
+        if self.idle_ticks >= self.idle_after_ticks:
+            return self.idle_interval
+        return self.fast_interval
+
+    def reschedule_ticks(self):
+        """重新选择刷新间隔；降频期间由字幕邮箱在下一次投递时唤醒"""
+        interval = self.choose_tick_interval()
+        if interval != self.fast_interval and not subtitle_mailbox.sleep(self.wake_ticks):
+            if interval is not None:
+                interval = self.fast_interval  # 还有未渲染的更新
+        self.set_tick_interval(interval)
+
+    def wake_ticks(self):
+        """字幕邮箱收到新内容（回调线程调用）"""
+        wx.CallAfter(self.on_mailbox_wake)
+
+    def on_mailbox_wake(self):
+        if not self:  # 窗口已销毁
+            return
+        self.idle_ticks = 0
+        self.reschedule_ticks()
+
+    def on_session_state_changed(self):
+        if not self:
+            return
+        self.reschedule_ticks()
+        if self.status_bar.IsShown():
+            self.update_status_bar()
+
+    def on_iconize(self, event):
+        """最小化时停止刷新和鼠标检查，恢复时立即刷新"""
+        if event.IsIconized():
+            self.set_tick_interval(None)
+            self.mouse_check_timer.Stop()
+        else:
+            self.idle_ticks = 0
+            self.reschedule_ticks()
+            self.mouse_check_timer.Start(self.hover_fallback_interval)
+        event.Skip()
+
     def on_timer(self, event):
         """处理定时器事件，从队列中获取并更新文本"""
         try:
-            while not wx_text_queue.empty():
-                transcription_result, translation_result = wx_text_queue.get()
-                self.update_text(transcription_result, translation_result)
+            # 每个文本框每次最多重绘一次，只渲染每句最新的快照
+            updates = subtitle_mailbox.take()
+            if updates:
+                self.update_text(updates)
+                self.idle_ticks = 0
+            else:
+                self.idle_ticks += 1
+            
+            # 每秒刷新一次状态栏中的输入电平（状态栏可见时）
+            now = time.monotonic()
+            if now >= self.next_status_update and self.status_bar.IsShown():
+                self.next_status_update = now + 1.0
+                self.update_status_bar()
+            # 每分钟输出一次合并邮箱的统计
+            if now >= self.next_stats_log:
+                self.next_stats_log = now + 60
+                stats = subtitle_mailbox.stats()
+                if stats['posted']:
+                    console_print(f"字幕邮箱: 投递 {stats['posted']}，合并 {stats['coalesced']}，跳过重复渲染 {stats['skipped']}")
+                    renderers = [self.get_renderer(box) for box in self.subtitle_text_boxes()]
+                    count = sum(r.render_count for r in renderers)
+                    if count:
+                        seconds = sum(r.render_seconds for r in renderers)
+                        console_print(f"字幕渲染({config.get('subtitle_renderer', 'richtext')}): {count} 次，"
+                                      f"平均 {seconds / count * 1000:.2f} ms/次")
+            
+            self.reschedule_ticks()
         except Exception as e:
             console_print(f"定时器更新出错: {e}")
         event.Skip()
@@ -2485,6 +5343,18 @@ class FloatingSubtitleWindow(wx.Frame):
         # 根据面板类型决定样式和功能
         is_chinese_panel = text_box_name == "chinese_text_box"
         
+        if config.get('subtitle_renderer', 'richtext') == 'canvas':
+            # 双缓冲画布：只绘制可见的末尾几行
+            text_box = SubtitleCanvas(panel, self.font_size)
+            text_box.SetMinSize((300, 35) if is_chinese_panel else (300, 60))
+            text_box.SetBackgroundColour(Win11Theme.COLORS['surface'])
+            
+            sizer = wx.BoxSizer(wx.VERTICAL)
+            sizer.Add(text_box, 1, wx.EXPAND | wx.ALL, 1)
+            panel.SetSizer(sizer)
+            setattr(self, text_box_name, text_box)
+            return panel
+        
         if is_chinese_panel:
             # 源语言面板：使用RichTextCtrl实现单行显示（与翻译区相同逻辑）
             text_box = rt.RichTextCtrl(
@@ -2573,6 +5443,11 @@ class FloatingSubtitleWindow(wx.Frame):
             # self.chinese_text_box.SetDefaultStyle(attr)
             # self.target_language_text_box.SetDefaultStyle(attr)
 
+            # 附加目标语言面板
+            for extra in self.extra_language_panels.values():
+                extra['text_box'].SetBackgroundColour(self.bg_color)
+                extra['text_box'].Refresh()
+
             # 刷新显示
             self.chinese_text_box.Refresh()
             self.target_language_text_box.Refresh()
@@ -2591,7 +5466,10 @@ class FloatingSubtitleWindow(wx.Frame):
 
     def update_status_bar(self):
         """更新状态栏信息"""
-        global audio_source, enable_tts, listening_paused, config, ffmpeg_path
+        global audio_source, enable_tts, config, ffmpeg_path
+        
+        if not self:  # 窗口已销毁（后台探测回调可能晚于窗口关闭）
+            return
         
         # 音频源状态
         audio_status = "🎤 麦克风" if audio_source == 'microphone' else "🔊 系统音频"
@@ -2600,18 +5478,45 @@ class FloatingSubtitleWindow(wx.Frame):
         tts_status = "🔊 TTS开" if enable_tts else "🔇 TTS关"
         
         # 监听状态
-        listening_status = "⏸️ 已暂停" if listening_paused else "🎧 监听中"
+        session_state = session_manager.state
+        if session_state == SessionManager.PAUSED:
+            listening_status = "⏸️ 已暂停"
+        elif session_state == SessionManager.IDLE:
+            listening_status = "💤 静音挂起"
+        elif session_state in (SessionManager.CONNECTING, SessionManager.RESTARTING):
+            listening_status = "🔄 连接中"
+        else:
+            listening_status = "🎧 监听中"
         
-        # FFmpeg状态
-        ffmpeg_status = "FFmpeg✅" if check_ffmpeg() else "FFmpeg❌"
+        # FFmpeg状态（只读缓存，未探测完成时由后台探测回调刷新）
+        ffmpeg_available = check_ffmpeg(block=False)
+        if ffmpeg_available is None:
+            ffmpeg_status = "FFmpeg⏳"
+        else:
+            ffmpeg_status = "FFmpeg✅" if ffmpeg_available else "FFmpeg❌"
         
         status_text = f"{audio_status} | {tts_status} | {listening_status} | {ffmpeg_status}"
+        if self.auto_selecting:
+            status_text += " | 🎯 检测设备信号中"
+        
+        # 输入电平（最近1秒内有测量结果时显示）
+        levels = audio_level_meter.snapshot()
+        if levels['timestamp'] is not None and time.monotonic() - levels['timestamp'] < 1.0:
+            status_text += f" | 🎚️ {levels['dbfs']:.0f} dBFS"
+            if levels['clipped']:
+                status_text += " ⚠️削波"
         self.status_bar.SetStatusText(status_text, 0)
 
+    def on_device_registry_updated(self, key):
+        """设备注册表探测完成回调（在探测线程中调用）"""
+        if key == 'ffmpeg':
+            wx.CallAfter(self.update_status_bar)
+
     def show_settings_dialog(self):
         """显示设置对话框"""
         global config, ffmpeg_path, audio_source, target_language, current_system_device, enable_tts, enable_api_calls, enable_console_output
         
+        old_languages = get_target_languages()
         dialog = SettingsDialog(self, config)
         if dialog.ShowModal() == wx.ID_OK:
             # 获取更新后的配置
@@ -2623,10 +5528,29 @@ class FloatingSubtitleWindow(wx.Frame):
             audio_source = config.get('audio_source', 'system')
             target_language = config.get('target_language', 'zh')
             current_system_device = config.get('current_system_device', None)
+            tts_was_enabled = enable_tts
             enable_tts = config.get('enable_tts', False)
+            if enable_tts and not tts_was_enabled:
+                warm_up_tts()
             enable_api_calls = config.get('api', {}).get('enabled', True)
             enable_console_output = config.get('enable_console_output', True)
             
+            # 目标语言可能已变化，按新设置重新登记字幕面板和TTS的订阅
+            languages = get_target_languages()
+            result_subscriptions.subscribe('ui', languages)
+            result_subscriptions.subscribe('tts', [get_tts_language()])
+            if languages != old_languages:
+                # 当前会话仍按旧的语言翻译，主目标面板切换到新语言后重建会话
+                self.switch_panel_language(target_language)
+                for language in list(self.extra_language_panels):
+                    if language not in languages:
+                        self.remove_extra_language_panel(language).close()
+                        subtitle_mailbox.reset_stream(language)
+                session_manager.request_restart('翻译目标语言已变化')
+            
+            # FFmpeg路径可能已变化，重新探测工具和设备
+            device_registry.refresh(['ffmpeg', 'dshow_devices'], background=True)
+            
             # 保存配置
             save_config()
             
@@ -2643,21 +5567,11 @@ class FloatingSubtitleWindow(wx.Frame):
 
     def toggle_listening(self):
         """切换监听暂停/恢复状态"""
-        global listening_paused, translator_stopped, need_restart_translator
-        
-        if listening_paused:
-            # 从暂停状态恢复
-            if translator_stopped:
-                # 如果translator已停止，标记需要重启
-                need_restart_translator = True
-                console_print("音频监听已恢复 - translator将重启")
-            else:
-                console_print("音频监听已恢复")
-            listening_paused = False
-        else:
-            # 暂停监听
-            listening_paused = True
+        # 状态机立即唤醒音频线程；暂停期间会话已关闭时恢复后自动重建
+        if session_manager.toggle_pause():
             console_print("音频监听已暂停")
+        else:
+            console_print("音频监听已恢复")
         
         # 更新状态栏
         self.update_status_bar()
@@ -2738,7 +5652,8 @@ class FloatingSubtitleWindow(wx.Frame):
         save_config()
         
         # 检查FFmpeg状态
-        ffmpeg_status = "可用" if check_ffmpeg() else "不可用"
+        ffmpeg_available = check_ffmpeg()
+        ffmpeg_status = "可用" if ffmpeg_available else "不可用"
         
         # 显示状态提示
         message = f"音频源已切换到: {source_name}\n\n"
@@ -2749,7 +5664,7 @@ class FloatingSubtitleWindow(wx.Frame):
             message += f"• 虚拟音频设备: 需要VB-CABLE等\n"
             message += f"• 立体声混音: 需要手动启用\n\n"
             
-            if not check_ffmpeg():
+            if not ffmpeg_available:
                 message += "⚠️ 建议安装FFmpeg以获得最佳体验\n\n"
         
         message += f"快捷键:\n"
@@ -2763,113 +5678,86 @@ class FloatingSubtitleWindow(wx.Frame):
         wx.MessageBox(message, "音频源切换", wx.OK | wx.ICON_INFORMATION)
 
     def show_audio_device_dialog(self):
-        """显示音频设备选择对话框"""
+        """显示音频设备选择对话框（设备在后台探测，结果陆续显示）"""
         global current_system_device
         
-        # 检查FFmpeg是否可用
-        ffmpeg_available = check_ffmpeg()
-        
-        # 获取不同类型的音频设备
-        virtual_devices = get_virtual_audio_devices()
-        all_devices = get_system_audio_devices()
+        dialog = AudioDeviceDialog(self)
+        selection = dialog.get_selection() if dialog.ShowModal() == wx.ID_OK else None
+        dialog.Destroy()
+        if selection is None:
+            return
         
-        if not all_devices and not ffmpeg_available:
-            wx.MessageBox("未检测到可用的音频设备，且FFmpeg不可用", "错误", wx.OK | wx.ICON_ERROR)
+        selected_index, selected_type = selection
+        if selected_type == 'auto':
+            self.apply_auto_device_selection()
             return
         
-        # 构建设备列表
-        device_list = []
-        device_indices = []
-        device_types = []  # 记录设备类型
+        current_system_device = selected_index
+        config['auto_select_device'] = False
         
-        if ffmpeg_available:
-            device_list.append("=== FFmpeg系统音频捕获（推荐） ===")
-            device_indices.append(None)
-            device_types.append('header')
-            
-            device_list.append("🎵 系统音频输出（自动检测）")
-            device_indices.append(-1)  # 特殊索引表示使用FFmpeg默认
-            device_types.append('ffmpeg')
+        # 对话框关闭时设备列表已经探测完成，这里只读缓存
+        all_devices = get_system_audio_devices(block=False)
+        message = ""
+        if selected_type == 'ffmpeg':
+            if selected_index == -1:
+                message = "已选择FFmpeg系统音频捕获（自动检测）\n\n"
+                message += "这将直接捕获系统音频输出，无需额外配置。\n\n"
+            else:
+                ffmpeg_devices = get_windows_audio_devices(block=False)
+                if selected_index < len(ffmpeg_devices):
+                    device_name = ffmpeg_devices[selected_index]['name']
+                    message = f"已选择FFmpeg设备:\n{device_name}\n\n"
             
-            # 添加FFmpeg检测到的设备
-            ffmpeg_devices = get_windows_audio_devices()
-            for i, dev in enumerate(ffmpeg_devices):
-                device_list.append(f"🎵 {dev['name']} (FFmpeg)")
-                device_indices.append(i)
-                device_types.append('ffmpeg')
-        
-        if virtual_devices:
-            device_list.append("=== 虚拟音频设备 ===")
-            device_indices.append(None)
-            device_types.append('header')
+            message += "优点:\n• 直接捕获系统音频\n• 无需额外软件\n• 音质优秀\n\n"
             
-            for dev in virtual_devices:
-                device_list.append(f"🔌 {dev['name']} (索引: {dev['index']})")
-                device_indices.append(dev['index'])
-                device_types.append('virtual')
-        
-        device_list.append("=== 所有输入设备 ===")
-        device_indices.append(None)
-        device_types.append('header')
-        
-        for dev in all_devices:
-            if dev['type'] == 'input':
-                device_list.append(f"🎤 {dev['name']} (索引: {dev['index']})")
-                device_indices.append(dev['index'])
-                device_types.append('regular')
-        
-        # 创建设备选择对话框
-        dialog = wx.SingleChoiceDialog(
-            self,
-            "请选择要监听的音频设备:\n\n"
-            "🎵 FFmpeg系统音频 - 直接捕获系统输出（推荐）\n"
-            "🔌 虚拟音频设备 - VB-CABLE等虚拟线缆\n"
-            "🎤 普通输入设备 - 麦克风等\n\n"
-            f"FFmpeg状态: {'✅ 可用' if ffmpeg_available else '❌ 不可用'}",
-            "选择音频设备",
-            device_list
-        )
+        elif selected_type == 'virtual':
+            selected_device = next((dev for dev in all_devices if dev['index'] == selected_index), None)
+            if selected_device:
+                message = f"已选择虚拟音频设备:\n{selected_device['name']}\n\n"
+                message += "使用说明:\n1. 将系统音频输出设置为此虚拟设备\n2. 播放音频即可捕获\n\n"
         
-        if dialog.ShowModal() == wx.ID_OK:
-            selection = dialog.GetSelection()
-            selected_index = device_indices[selection]
-            selected_type = device_types[selection]
-            
-            if selected_index is not None and selected_type != 'header':
-                current_system_device = selected_index
-                
-                if selected_type == 'ffmpeg':
-                    if selected_index == -1:
-                        message = "已选择FFmpeg系统音频捕获（自动检测）\n\n"
-                        message += "这将直接捕获系统音频输出，无需额外配置。\n\n"
-                    else:
-                        ffmpeg_devices = get_windows_audio_devices()
-                        if selected_index < len(ffmpeg_devices):
-                            device_name = ffmpeg_devices[selected_index]['name']
-                            message = f"已选择FFmpeg设备:\n{device_name}\n\n"
-                    
-                    message += "优点:\n• 直接捕获系统音频\n• 无需额外软件\n• 音质优秀\n\n"
-                    
-                elif selected_type == 'virtual':
-                    selected_device = next((dev for dev in all_devices if dev['index'] == selected_index), None)
-                    if selected_device:
-                        message = f"已选择虚拟音频设备:\n{selected_device['name']}\n\n"
-                        message += "使用说明:\n1. 将系统音频输出设置为此虚拟设备\n2. 播放音频即可捕获\n\n"
-                
-                else:
-                    selected_device = next((dev for dev in all_devices if dev['index'] == selected_index), None)
-                    if selected_device:
-                        message = f"已选择输入设备:\n{selected_device['name']}\n\n"
-                
-                message += "重启程序以应用新设置"
-                wx.MessageBox(message, "设备选择完成", wx.OK | wx.ICON_INFORMATION)
-                
-                # 保存配置
-                save_config()
-                
-                console_print(f"已选择音频设备: 索引={current_system_device}, 类型={selected_type}")
+        else:
+            selected_device = next((dev for dev in all_devices if dev['index'] == selected_index), None)
+            if selected_device:
+                message = f"已选择输入设备:\n{selected_device['name']}\n\n"
         
-        dialog.Destroy()
+        message += "重启程序以应用新设置"
+        wx.MessageBox(message, "设备选择完成", wx.OK | wx.ICON_INFORMATION)
+        
+        # 保存配置
+        save_config()
+        
+        console_print(f"已选择音频设备: 索引={current_system_device}, 类型={selected_type}")
+
+    def apply_auto_device_selection(self):
+        """按实际信号能量自动选择音频设备（在后台线程中检测，字幕继续刷新）"""
+        if self.auto_selecting:
+            return
+        self.auto_selecting = True
+        console_print("正在检测各输入设备的音频信号，请保持音频播放...")
+        self.update_status_bar()
+        run_probe_in_background(auto_select_audio_device, self.on_auto_device_selected)
+
+    def on_auto_device_selected(self, best, error):
+        """自动选择设备完成（UI线程）"""
+        global current_system_device, current_system_device_name
+        
+        if not self:  # 窗口已销毁
+            return
+        self.auto_selecting = False
+        self.update_status_bar()
+        
+        # 之后每次启动都重新按信号选择设备
+        config['auto_select_device'] = True
+        
+        if best is not None:
+            current_system_device = best['index']
+            current_system_device_name = best['name']
+            message = f"已自动选择音频设备:\n{best['name']}\n\n每次启动时都会重新检测有信号的设备。\n\n重启程序以应用新设置"
+        else:
+            message = "未检测到有音频信号的设备，请确认正在播放音频。\n\n启动时会再次自动检测。"
+        save_config()
+        wx.MessageBox(message, "自动选择设备", wx.OK | wx.ICON_INFORMATION)
 
     def toggle_color_mode(self):
         """切换黑白颜色模式"""
@@ -2906,18 +5794,11 @@ class FloatingSubtitleWindow(wx.Frame):
         self.target_language_text_box.Freeze()
 
         try:
-            # 更新背景色和文字颜色
-            self.chinese_text_box.SetBackgroundColour(self.bg_color)
-            self.target_language_text_box.SetBackgroundColour(self.bg_color)
-
-            # 强制应用新的文字颜色
-            attr = wx.TextAttr(self.text_color)
-            attr.SetLineSpacing(14)  # 设置行间距
-            self.chinese_text_box.SetDefaultStyle(attr)
-            self.target_language_text_box.SetDefaultStyle(attr)
-            # 重写当前文本以立即生效
-            self.chinese_text_box.SetValue(self.chinese_text_box.GetValue())
-            self.target_language_text_box.SetValue(self.target_language_text_box.GetValue())
+            # 更新所有字幕面板（含附加目标语言面板）的背景色、字体和文字颜色
+            for text_box in self.subtitle_text_boxes():
+                self.apply_text_box_theme(text_box)
+            # 用新的文字颜色整体重绘一次字幕
+            self.rerender_all()
 
             # 强制刷新显示
             self.chinese_text_box.Refresh()
@@ -2978,109 +5859,171 @@ class FloatingSubtitleWindow(wx.Frame):
             except Exception as theme_error:
                 console_print(f"Error setting window theme: {theme_error}")
 
-    def update_text(self, asr_result: TranscriptionResult, translation_result: TranslationResult):
-        """更新文本框内容"""
-
-        def process_result(result, text_buffer, text_box):
-            is_new_sentence = False
-            fixed_text = ''
-            unfixed_text = ''
-
-            if result is not None:  # 检查结果是否为空
-                for word in result.words:
-                    if word.fixed:
-                        fixed_text += word.text
-                    else:
-                        unfixed_text += word.text
-
-                # Update buffers with new text
-                text_buffer[-1] = [fixed_text, unfixed_text]
-
-                if result.is_sentence_end:
-                    text_buffer.append(['', ''])
-
-            fixed_text = ''
-            unfixed_text = ''
-            if result is not None and result.stash is not None:  # 检查结果和stash是否为空
-                for word in result.stash.words:
-                    if word['fixed']:
-                        fixed_text += word.text
-                    else:
-                        unfixed_text += word.text
-                text_buffer[-1] = [fixed_text, unfixed_text]
-
-            # 检查是否为源语言文本框（中文面板）
-            is_chinese_box = text_box == self.chinese_text_box
-            
-            if is_chinese_box:
-                # 源语言面板：使用RichTextCtrl，与翻译区完全相同的逻辑
-                text_box.Clear()
-
-                attr = rt.RichTextAttr()
-                attr.SetAlignment(wx.TEXT_ALIGNMENT_LEFT)  # 左对齐
-                attr.SetLineSpacing(14)  # 设置行间距
-                text_box.SetDefaultStyle(attr)
-
-                normal_font = wx.Font(14, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL)
-                text_box.BeginFont(normal_font)
-                text_box.BeginTextColour(wx.BLACK)
-                if self.is_dark_mode:
-                    text_box.BeginTextColour(wx.WHITE)
-
-                if len(text_buffer) > 1:
-                    text_box.WriteText(''.join([x[0] + x[1] for x in text_buffer[:-1]]))
-
-                # Write the last line in blue with larger font
-                large_font = wx.Font(14, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_BOLD)
-                text_box.BeginFont(large_font)
-                text_box.BeginTextColour(wx.BLACK)
-                if self.is_dark_mode:
-                    text_box.BeginTextColour(wx.WHITE)
-                text_box.WriteText(text_buffer[-1][0] + text_buffer[-1][1])
-                text_box.EndTextColour()
-                text_box.EndFont()
-
-                # Auto-scroll to the bottom of the text boxes
-                text_box.ShowPosition(text_box.GetLastPosition() - 2)
-            else:
-                # 目标语言面板：使用RichTextCtrl，显示历史记录（保持原有逻辑）
-                # Clear and update text box
-                text_box.Clear()
-
-                attr = rt.RichTextAttr()
-                attr.SetAlignment(wx.TEXT_ALIGNMENT_LEFT)  #左对齐
-                attr.SetLineSpacing(14)  # 设置行间距
-                text_box.SetDefaultStyle(attr)
-
-                normal_font = wx.Font(14, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL)
-                text_box.BeginFont(normal_font)
-                text_box.BeginTextColour(wx.BLACK)
-                if self.is_dark_mode:
-                    text_box.BeginTextColour(wx.WHITE)
-
-                if len(text_buffer) > 1:
-                    text_box.WriteText(''.join([x[0] + x[1] for x in text_buffer[:-1]]))
-
-                # Write the last line in blue with larger font
-                large_font = wx.Font(14, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_BOLD)
-                text_box.BeginFont(large_font)
-                text_box.BeginTextColour(wx.BLACK)
-                if self.is_dark_mode:
-                    text_box.BeginTextColour(wx.WHITE)
-                text_box.WriteText(text_buffer[-1][0] + text_buffer[-1][1])
-                text_box.EndTextColour()
-                text_box.EndFont()
-
-                # Auto-scroll to the bottom of the text boxes
-                text_box.ShowPosition(text_box.GetLastPosition() - 2)
+    def apply_text_box_theme(self, text_box):
+        """按当前颜色模式和字号设置字幕文本框的背景色、字体和文字颜色"""
+        text_box.SetBackgroundColour(self.bg_color)
+        weight = wx.FONTWEIGHT_BOLD if text_box is self.chinese_text_box else wx.FONTWEIGHT_NORMAL
+        text_box.SetFont(Win11Theme.get_font(self.font_size, weight))
+        attr = wx.TextAttr(self.text_color)
+        attr.SetLineSpacing(14)  # 设置行间距
+        text_box.SetDefaultStyle(attr)
+
+    def switch_panel_language(self, language):
+        """主目标语言变化后，目标语言面板改为显示新语言
+
+        新语言已有附加面板时接管它的历史并移除该面板；旧语言仍在翻译时，
+        它的历史交给一个附加面板，两边的句子序号都和邮箱保持一致。
+        """
+        if language == self.panel_language:
+            return
+        old_language, old_history = self.panel_language, self.target_language_text_buffer
+        history = self.remove_extra_language_panel(language)
+        if history is None:
+            history = self.create_history(language)
+            subtitle_mailbox.reset_stream(language)  # 新历史从序号0开始
+        
+        self.panel_language = language
+        self.target_language_text_buffer = history
+        self.text_box_histories[self.target_language_text_box.GetId()] = history
+        renderer = self.get_renderer(self.target_language_text_box)
+        renderer.browsing = False
+        renderer.reset()
+        self.render_text_box(history, self.target_language_text_box)
+        
+        if old_language in get_target_languages():
+            self.get_extra_language_panel(old_language, old_history)
+        else:
+            old_history.close()
+            subtitle_mailbox.reset_stream(old_language)
+        self.panel.Layout()
+        console_print(f"目标语言面板切换为 {language}")
+
+    def remove_extra_language_panel(self, language):
+        """移除附加目标语言的字幕面板，返回它的历史（没有该面板时返回None）"""
+        extra = self.extra_language_panels.pop(language, None)
+        if extra is None:
+            return None
+        del self.text_box_histories[extra['text_box'].GetId()]
+        self.renderers.pop(extra['text_box'].GetId(), None)
+        extra['panel'].Destroy()
+        self.panel.Layout()
+        return extra['text_buffer']
+
+    def get_extra_language_panel(self, language, history=None):
+        """取附加目标语言的字幕面板，第一次使用时创建（可以接管已有的历史）"""
+        extra = self.extra_language_panels.get(language)
+        if extra is None:
+            panel = self.create_language_panel(f"🌍 {language}", f"target_text_box_{language}")
+            text_box = getattr(self, f"target_text_box_{language}")
+            self.apply_text_box_theme(text_box)
+            self.main_sizer.Add(panel, 1, wx.EXPAND | wx.ALL, 2)
+            self.panel.Layout()
+            extra = {'panel': panel, 'text_box': text_box, 'text_buffer': history or self.create_history(language)}
+            self.text_box_histories[text_box.GetId()] = extra['text_buffer']
+            text_box.Bind(wx.EVT_MOUSEWHEEL, self.on_text_box_mousewheel)
+            self.bind_hover_events(text_box)
+            self.extra_language_panels[language] = extra
+            console_print(f"已创建 {language} 字幕面板")
+        return extra
+
+    def get_stream_text(self, stream):
+        """取某个流对应的(文本缓冲区, 文本框)"""
+        if stream == 'source':
+            return self.chinese_text_buffer, self.chinese_text_box
+        if stream == self.panel_language:
+            return self.target_language_text_buffer, self.target_language_text_box
+        extra = self.get_extra_language_panel(stream)
+        return extra['text_buffer'], extra['text_box']
+
+    def update_text(self, updates):
+        """把邮箱中取出的句子快照写入文本缓冲区，每个有变化的文本框重绘一次"""
+        changed = {}
+        for stream, index, snapshot in updates:
+            if stream != 'source' and not result_subscriptions.wants('ui', stream):
+                continue  # 目标语言设置变化前投递的旧语言句子
+            text_buffer, text_box = self.get_stream_text(stream)
+            renderer = self.get_renderer(text_box)
+            if renderer.committed_lines is not None and text_buffer.base <= index < renderer.committed_lines:
+                renderer.reset()  # 已写入的句子有更新（很少见），整体重绘
+            # 历史中的每一行对应一个句子序号，最后一行是正在识别的句子
+            text_buffer.set(index, snapshot['fixed'], snapshot['unfixed'], snapshot['ended'])
+            changed[stream] = (text_buffer, text_box)
+        
+        for text_buffer, text_box in changed.values():
+            self.render_text_box(text_buffer, text_box)
+
+    def create_history(self, name):
+        """按配置创建一个字幕面板的有界历史"""
+        return SubtitleHistory(
+            name,
+            max_sentences=self.MAX_SENTENCES,
+            max_chars=self.MAX_CHARS,
+            transcript_dir=config.get('history', {}).get('transcript_dir', 'transcripts')
+        )
 
-        if asr_result:
-            process_result(asr_result, self.chinese_text_buffer, self.chinese_text_box)
+    def on_text_box_mousewheel(self, event):
+        """向上滚动时暂停自动滚动，滚到顶部时从转录文件读回更早的句子；滚回底部后恢复"""
+        event.Skip()
+        text_box = event.GetEventObject()
+        history = self.text_box_histories.get(text_box.GetId())
+        if history is None:
+            return
+        if isinstance(text_box, SubtitleCanvas):
+            # 画布按句滚动，自己处理读回和恢复跟随
+            count = config.get('history', {}).get('load_back_sentences', 20)
+            text_box.scroll(history, 1 if event.GetWheelRotation() > 0 else -1, count)
+            return
+        renderer = self.get_renderer(text_box)
+        
+        if event.GetWheelRotation() > 0:
+            renderer.browsing = True
+            if text_box.GetViewStart()[1] == 0 and renderer.first_line:
+                count = config.get('history', {}).get('load_back_sentences', 20)
+                texts = history.load_spilled(renderer.first_line - count, renderer.first_line)
+                renderer.prepend(texts, self.is_dark_mode)
+        elif renderer.browsing:
+            wx.CallAfter(self.check_history_browsing, text_box)
+
+    def check_history_browsing(self, text_box):
+        """滚回底部时结束浏览，恢复自动滚动并丢弃读回的历史"""
+        if not text_box:
+            return
+        renderer = self.get_renderer(text_box)
+        if renderer.browsing and text_box.IsPositionVisible(text_box.GetLastPosition()):
+            renderer.browsing = False
+            self.render_text_box(self.text_box_histories[text_box.GetId()], text_box)
+
+    def on_window_close(self, event):
+        """关闭窗口时关闭转录文件"""
+        for history in self.text_box_histories.values():
+            history.close()
+        event.Skip()
 
-        if translation_result:
-            translation = translation_result.get_translation('zh')
-            if translation:
-                process_result(translation, self.target_language_text_buffer, self.target_language_text_box)
+    def get_renderer(self, text_box):
+        """取文本框的增量渲染器，第一次使用时创建（画布本身就是渲染器）"""
+        if isinstance(text_box, SubtitleCanvas):
+            return text_box
+        renderer = self.renderers.get(text_box.GetId())
+        if renderer is None:
+            renderer = self.renderers[text_box.GetId()] = IncrementalSubtitleRenderer(text_box, self.font_size)
+        return renderer
+
+    def render_text_box(self, text_buffer, text_box):
+        """增量重绘一个文本框"""
+        self.get_renderer(text_box).render(text_buffer, self.is_dark_mode)
+
+    def subtitle_text_boxes(self):
+        """所有字幕文本框"""
+        boxes = [self.chinese_text_box, self.target_language_text_box]
+        return boxes + [extra['text_box'] for extra in self.extra_language_panels.values()]
+
+    def rerender_all(self):
+        """整体重绘所有字幕文本框（颜色模式变化后）"""
+        for text_box in self.subtitle_text_boxes():
+            text_buffer = self.text_box_histories[text_box.GetId()]
+            renderer = self.get_renderer(text_box)
+            renderer.reset()
+            renderer.render(text_buffer, self.is_dark_mode)
 
 
 if __name__ == '__main__':
@@ -3091,6 +6034,9 @@ if __name__ == '__main__':
         # 初始化 Dashscope API key
         init_dashscope_api_key()
         
+        # 在后台提前探测FFmpeg和音频设备，后续查询直接使用缓存
+        device_registry.prefetch()
+        
         # 设置DPI感知
         ctypes.windll.shcore.SetProcessDpiAwareness(2) 
         
@@ -3100,6 +6046,8 @@ if __name__ == '__main__':
         console_print("=" * 50)
         console_print(f"默认音频源: {'🎤 麦克风' if audio_source == 'microphone' else '🔊 系统音频'}")
         console_print(f"TTS状态: {'启用' if enable_tts else '禁用'}")
+        if enable_tts:
+            warm_up_tts()
         ffmpeg_available = check_ffmpeg()
         console_print(f"FFmpeg状态: {'可用' if ffmpeg_available else '不可用'}")
         console_print("=" * 50)
@@ -3132,10 +6080,19 @@ if __name__ == '__main__':
         console_print(f"  Ctrl+H: 切换标题栏")
         console_print()
         
-        asr_thread = threading.Thread(target=gummyAsrTask, daemon=True)
-        asr_thread.start()
-        tts_thread = threading.Thread(target=cosyvoiceTtsTask, daemon=True)
-        tts_thread.start()
+        runtime_config = config.get('runtime', {})
+        if runtime_config.get('mode', 'threads') == 'asyncio':
+            console_print("使用asyncio运行时")
+            pipeline = AsyncPipeline(
+                audio_queue_frames=runtime_config.get('audio_queue_frames', 50),
+                tts_queue_words=runtime_config.get('tts_queue_words', 200)
+            )
+            pipeline.start()
+        else:
+            asr_thread = threading.Thread(target=gummyAsrTask, daemon=True)
+            asr_thread.start()
+            tts_thread = threading.Thread(target=cosyvoiceTtsTask, daemon=True)
+            tts_thread.start()
         
         app = wx.App(False)
         frame = FloatingSubtitleWindow()